@@ -1,14 +1,87 @@
 import argparse
+import os
 
-from src.run_experience import run_experience
+from src.distributed.job_queue import SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE
+from src.run_experience import (
+    run_analysis_daemon,
+    run_distributed_experience,
+    run_experience,
+    run_shard_queue_server,
+    run_shard_worker,
+    submit_experience_to_daemon,
+)
+from src.service.analysis_daemon import DEFAULT_DAEMON_PORT
 
 
 def entrypoint():
     parser = argparse.ArgumentParser()
-    parser.add_argument("-c", "--config", type=str, required=True, help="The path to the configuration file to be used")
+    parser.add_argument("-c", "--config", type=str, help="The path to the configuration file to be used")
+    parser.add_argument(
+        "-m",
+        "--mode",
+        type=str,
+        choices=["local", "coordinator", "worker", "queue-server", "daemon", "submit"],
+        default="local",
+        help="local: process the experience on this machine. "
+        "coordinator: cut the experience into shards and wait for the workers. "
+        "worker: process the shards of the queue. "
+        "queue-server: serve a queue on a socket. "
+        "daemon: start the analysis daemon. "
+        "submit: submit the experience to a running analysis daemon.",
+    )
+    parser.add_argument(
+        "-q",
+        "--queue",
+        type=str,
+        help="The shard queue, either 'sqlite:<path_to_database_file>' or 'socket:<host>:<port>'",
+    )
+    parser.add_argument("--shard-size", type=int, default=500, help="The number of image pairs per shard")
+    parser.add_argument(
+        "--shard-timeout",
+        type=float,
+        default=None,
+        help="The time (in seconds) after which a shard without result is given to another worker",
+    )
+    parser.add_argument(
+        "--authkey",
+        type=str,
+        default=None,
+        help="The secret key shared by a socket queue server and its clients "
+        "(defaults to the CROSSBOW_SHARD_QUEUE_AUTHKEY environment variable)",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_DAEMON_PORT, help="The local port of the analysis daemon")
+    parser.add_argument(
+        "--max-concurrent-jobs", type=int, default=None, help="The number of jobs the daemon runs at the same time"
+    )
+    parser.add_argument("--left-images", type=str, default=None, help="Overrides the left images directory")
+    parser.add_argument("--right-images", type=str, default=None, help="Overrides the right images directory")
     args = parser.parse_args()
 
-    run_experience(args.config)
+    if args.mode in ["local", "coordinator", "submit"] and args.config is None:
+        parser.error(f"The {args.mode} mode requires a configuration file (--config).")
+    if args.mode in ["coordinator", "worker", "queue-server"] and args.queue is None:
+        parser.error(f"The {args.mode} mode requires a queue (--queue).")
+    if (
+        args.queue is not None
+        and args.queue.startswith("socket:")
+        and not (args.authkey or os.environ.get(SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE))
+    ):
+        parser.error(
+            f"A socket queue requires a secret key (--authkey or {SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE})."
+        )
+
+    if args.mode == "local":
+        run_experience(args.config)
+    elif args.mode == "coordinator":
+        run_distributed_experience(args.config, args.queue, args.shard_size, args.authkey)
+    elif args.mode == "worker":
+        run_shard_worker(args.queue, args.shard_timeout, args.authkey)
+    elif args.mode == "queue-server":
+        run_shard_queue_server(args.queue.partition(":")[2], args.shard_timeout, args.authkey)
+    elif args.mode == "daemon":
+        run_analysis_daemon(args.port, args.max_concurrent_jobs)
+    else:
+        submit_experience_to_daemon(args.config, args.port, args.left_images, args.right_images)
 
 
 if __name__ == "__main__":
@@ -18,12 +18,18 @@ class Config:
 
         class ConfigCamera:
             def __init__(
-                self, intrinsic_matrix: np.ndarray, extrinsic_matrix: np.ndarray, framerate, directory_path: str
+                self,
+                intrinsic_matrix: np.ndarray,
+                extrinsic_matrix: np.ndarray,
+                framerate,
+                directory_path: str,
+                distortion_coefficients: np.ndarray = None,
             ):
                 self.intrinsic_matrix = intrinsic_matrix
                 self.extrinsic_matrix = extrinsic_matrix
                 self.framerate = framerate
                 self.directory_path = directory_path
+                self.distortion_coefficients = distortion_coefficients
 
             def set_intrinsic_matrix(self, new_intrinsic_matrix: np.ndarray):
                 self.intrinsic_matrix = new_intrinsic_matrix
@@ -34,6 +40,9 @@ class Config:
             def set_directory_path(self, new_directory_path: str):
                 self.directory_path = new_directory_path
 
+            def set_distortion_coefficients(self, new_distortion_coefficients: np.ndarray):
+                self.distortion_coefficients = new_distortion_coefficients
+
         self.left_camera_config = ConfigCamera(*self._extract_camera_config(CameraIdentifier.LEFT_CAMERA))
         self.right_camera_config = ConfigCamera(*self._extract_camera_config(CameraIdentifier.RIGHT_CAMERA))
 
@@ -62,13 +71,17 @@ class Config:
         gamma = config_camera["gamma"]
         framerate = config_camera["framerate"]
         images_folder_path = config_camera["imagesFolderPath"]
+        # The distortion coefficients are optional: without them, the camera is considered as a perfect pinhole
+        distortion_coefficients = config_camera.get("distortionCoefficients")
+        if distortion_coefficients is not None:
+            distortion_coefficients = np.array(distortion_coefficients, dtype=float)
 
         rotation = Rot.from_euler("xyz", [alpha, beta, gamma], degrees=True).as_matrix()
 
         intrinsic_matrix = self._get_intrinsic_matrix_from_params(focal_x, focal_y, skew, ppx, ppy)
         extrinsinc_matrix = self._get_extrinsic_matrix_from_params(rotation, translation)
 
-        return intrinsic_matrix, extrinsinc_matrix, framerate, images_folder_path
+        return intrinsic_matrix, extrinsinc_matrix, framerate, images_folder_path, distortion_coefficients
 
     def _read_config_file(self, config_path):
         file_path = Path(config_path)
@@ -4,9 +4,20 @@ from enum import Enum
 # This is the enumeration to be modified in case you want to add your own method.
 class AvailableProjectileFinderMethods(Enum):
     FIND_CIRCLES = 1
+    FIND_COLOR_BLOB = 2
     DUMMY_METHOD_EXAMPLE = 99
 
 
+class AvailableProjectileRefinementMethods(Enum):
+    INTENSITY_CENTROID = 1
+    EDGE_CIRCLE_FIT = 2
+
+
+class AvailableFramePreFilterMethods(Enum):
+    FRAME_DIFFERENCE = 1
+    INTENSITY_STATISTICS = 2
+
+
 class CameraIdentifier(Enum):
     LEFT_CAMERA = 0
     RIGHT_CAMERA = 1
@@ -18,6 +29,22 @@ class ColorDomain(Enum):
     RGB = 1
 
 
+class AvailableBallisticModels(Enum):
+    PARABOLIC = 0
+    QUADRATIC_DRAG = 1
+
+
+# Default HSV range of the fluorescent orange paint of the projectiles.
+# The opencv convention is used: H is in [0, 179], S and V are in [0, 255].
+DEFAULT_PROJECTILE_LOWER_HSV_COLOR = (5, 150, 150)
+DEFAULT_PROJECTILE_UPPER_HSV_COLOR = (25, 255, 255)
+
+# Scale factor between the median absolute deviation and the standard deviation of a normal distribution.
+MAD_TO_STANDARD_DEVIATION = 1.4826
+
+# The distortion models of opencv: k1, k2, p1, p2[, k3[, k4, k5, k6[, s1, s2, s3, s4[, tx, ty]]]]
+VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS = (4, 5, 8, 12, 14)
+
 ALLOWED_IMAGE_FORMATS = [".jpg", ".png", ".jpeg", ".tif"]
 
 
@@ -40,6 +67,13 @@ VALID_CONFIGURATION_JSON_SCHEMA = {
                 "gamma": {"type": "number"},
                 "imagesFolderPath": {"type": "string"},
                 "framerate": {"type": "number"},
+                # Optional, in the opencv order (see VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS)
+                "distortionCoefficients": {
+                    "oneOf": [
+                        {"type": "array", "items": {"type": "number"}, "minItems": size, "maxItems": size}
+                        for size in VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS
+                    ]
+                },
             },
             "required": [
                 "focalX",
@@ -1,6 +1,6 @@
 import numpy as np
 
-from utils.utils import read_image
+from utils.utils import ImageBufferPool, read_image
 
 
 class Point2D:
@@ -73,6 +73,10 @@ class Point2DPair(Pair):
     def __init__(self, left_point: Point2D, right_point: Point2D):
         super().__init__(left_point, right_point)
 
+    def is_valid(self):
+        # The projectile is seen by both cameras, so its 3D position can be reconstructed
+        return self.left.is_valid() and self.right.is_valid()
+
 
 class TimedData:
     def __init__(self, timestamp=None, data=None):
@@ -140,14 +144,31 @@ class TimedImagePair(TimedData):
         super().__init__(timestamp, images_pair)
 
     @classmethod
-    def from_timed_path_pair(cls, timed_path_pair: TimedPathPair):
+    def from_timed_path_pair(
+        cls, timed_path_pair: TimedPathPair, in_grayscale: bool = False, buffer_pool: ImageBufferPool = None
+    ):
         timestamp, path_pair = timed_path_pair.get()
-        left_image = read_image(path_pair.left)
-        right_image = read_image(path_pair.right)
+        left_image = read_image(path_pair.left, in_grayscale=in_grayscale, buffer_pool=buffer_pool)
+        right_image = read_image(path_pair.right, in_grayscale=in_grayscale, buffer_pool=buffer_pool)
         return cls(timestamp, left_image, right_image)
 
 
 class TimedPoint2DPair(TimedData):
     def __init__(self, timestamp, left_point2d: Point2D, right_point2d: Point2D):
-        points2d_pair = Pair(left_point2d, right_point2d)
+        points2d_pair = Point2DPair(left_point2d, right_point2d)
         super().__init__(timestamp, points2d_pair)
+
+    def to_list(self):
+        # Flat representation [timestamp, left_x, left_y, right_x, right_y], easy to serialize
+        return [
+            float(self.timestamp),
+            float(self.data.left.x),
+            float(self.data.left.y),
+            float(self.data.right.x),
+            float(self.data.right.y),
+        ]
+
+    @classmethod
+    def from_list(cls, timed_point2d_pair_as_list):
+        timestamp, left_x, left_y, right_x, right_y = timed_point2d_pair_as_list
+        return cls(timestamp, Point2D(left_x, left_y), Point2D(right_x, right_y))
@@ -0,0 +1,477 @@
+import json
+import os
+import socket
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, answer_challenge, deliver_challenge
+from typing import Dict, List, Optional, Tuple
+
+# The socket queue has no default authentication key: each deployment must choose its own secret one
+SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE = "CROSSBOW_SHARD_QUEUE_AUTHKEY"
+
+
+class FrameShard:
+    """
+    A range of image pairs [start_index, stop_index[ of the FilesManager list, to be processed by a single worker.
+    The job_id is the one given by ShardQueue.set_job: the shard ids start from 0 again at every job, so it tells
+    which job the shard (and its result) belongs to.
+    """
+
+    def __init__(self, shard_id: int, start_index: int, stop_index: int, job_id: str = None):
+        self.shard_id = shard_id
+        self.start_index = start_index
+        self.stop_index = stop_index
+        self.job_id = job_id
+
+    def to_dict(self) -> Dict:
+        return {
+            "shardId": self.shard_id,
+            "startIndex": self.start_index,
+            "stopIndex": self.stop_index,
+            "jobId": self.job_id,
+        }
+
+    @classmethod
+    def from_dict(cls, shard_as_dict: Dict):
+        return cls(
+            shard_as_dict["shardId"],
+            shard_as_dict["startIndex"],
+            shard_as_dict["stopIndex"],
+            shard_as_dict.get("jobId"),
+        )
+
+
+class ShardQueue(ABC):
+    """
+    Base class of the queues shared by the coordinator and the workers.
+    A queue holds one job (the dictionary of an ExperienceJobDescription) at a time, its shards, and their results.
+    A shard given to a worker is given again to another one if no result was posted after shard_timeout seconds
+    (in case the worker died). If shard_timeout is None, a shard is never given twice.
+    Every job gets a new job id: the shards (put or posted) of another job than the current one are ignored, so that
+    a late worker or coordinator of a previous job can not mix its shards with the current ones.
+    """
+
+    @abstractmethod
+    def set_job(self, job_as_dict: Dict) -> str:
+        # Setting a new job discards the shards and results of the previous one. Returns the id of the new job
+        pass
+
+    @abstractmethod
+    def get_job(self) -> Optional[Tuple[str, Dict]]:
+        # The id and the dictionary of the current job
+        pass
+
+    @abstractmethod
+    def put_shards(self, shards: List[FrameShard]):
+        pass
+
+    @abstractmethod
+    def get_next_shard(self) -> Optional[FrameShard]:
+        pass
+
+    @abstractmethod
+    def post_shard_result(self, shard: FrameShard, shard_result: List):
+        pass
+
+    @abstractmethod
+    def get_number_of_remaining_shards(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_shard_results(self) -> Dict[int, List]:
+        pass
+
+
+class MemoryShardQueue(ShardQueue):
+    """
+    Queue living in the memory of a single process. It is meant to be served to the workers by a ShardQueueServer.
+    """
+
+    def __init__(self, shard_timeout: float = None):
+        self._lock = threading.Lock()
+        self._shard_timeout = shard_timeout
+        self._job_id: str = None
+        self._job_as_dict = None
+        self._pending_shards = deque()
+        self._running_shards: Dict[int, Tuple[FrameShard, float]] = {}
+        self._shard_results: Dict[int, List] = {}
+
+    def set_job(self, job_as_dict: Dict) -> str:
+        with self._lock:
+            self._job_id = uuid.uuid4().hex
+            self._job_as_dict = job_as_dict
+            self._pending_shards.clear()
+            self._running_shards.clear()
+            self._shard_results.clear()
+            return self._job_id
+
+    def get_job(self) -> Optional[Tuple[str, Dict]]:
+        with self._lock:
+            return (self._job_id, self._job_as_dict) if self._job_as_dict is not None else None
+
+    def put_shards(self, shards: List[FrameShard]):
+        with self._lock:
+            self._pending_shards.extend(shard for shard in shards if shard.job_id == self._job_id)
+
+    def _requeue_timed_out_shards(self):
+        if self._shard_timeout is None:
+            return
+        now = time.monotonic()
+        for shard_id, (shard, claim_time) in list(self._running_shards.items()):
+            if now - claim_time > self._shard_timeout:
+                del self._running_shards[shard_id]
+                self._pending_shards.append(shard)
+
+    def get_next_shard(self) -> Optional[FrameShard]:
+        with self._lock:
+            self._requeue_timed_out_shards()
+            if not self._pending_shards:
+                return None
+            shard = self._pending_shards.popleft()
+            self._running_shards[shard.shard_id] = (shard, time.monotonic())
+            return shard
+
+    def post_shard_result(self, shard: FrameShard, shard_result: List):
+        shard_id = shard.shard_id
+        with self._lock:
+            if shard.job_id != self._job_id:
+                return
+            self._running_shards.pop(shard_id, None)
+            # A shard that timed out may have been requeued: it does not need to be processed anymore
+            self._pending_shards = deque(shard for shard in self._pending_shards if shard.shard_id != shard_id)
+            self._shard_results.setdefault(shard_id, shard_result)
+
+    def get_number_of_remaining_shards(self) -> int:
+        with self._lock:
+            return len(self._pending_shards) + len(self._running_shards)
+
+    def get_shard_results(self) -> Dict[int, List]:
+        with self._lock:
+            return dict(self._shard_results)
+
+
+class SqliteShardQueue(ShardQueue):
+    """
+    Queue stored in a SQLite database file. The workers only need to access this file, for instance on a shared
+    filesystem (the filesystem must support the file locks used by SQLite).
+    """
+
+    def __init__(self, database_path: str, shard_timeout: float = None):
+        self._shard_timeout = shard_timeout
+        # The connection is in autocommit mode: the transactions are explicitly opened when needed
+        self._connection = sqlite3.connect(database_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS current_job (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    job_id TEXT NOT NULL,
+                    description TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard_id INTEGER PRIMARY KEY,
+                    start_index INTEGER NOT NULL,
+                    stop_index INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    claim_time REAL
+                );
+                CREATE TABLE IF NOT EXISTS results (shard_id INTEGER PRIMARY KEY, result TEXT NOT NULL);
+                """
+            )
+
+    def _get_current_job_id(self) -> Optional[str]:
+        # Must be called within a transaction
+        row = self._connection.execute("SELECT job_id FROM current_job WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def set_job(self, job_as_dict: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute("DELETE FROM shards")
+            self._connection.execute("DELETE FROM results")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO current_job VALUES (0, ?, ?)", (job_id, json.dumps(job_as_dict))
+            )
+            self._connection.execute("COMMIT")
+        return job_id
+
+    def get_job(self) -> Optional[Tuple[str, Dict]]:
+        with self._lock:
+            row = self._connection.execute("SELECT job_id, description FROM current_job WHERE id = 0").fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put_shards(self, shards: List[FrameShard]):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            current_job_id = self._get_current_job_id()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO shards VALUES (?, ?, ?, 'pending', NULL)",
+                [
+                    (shard.shard_id, shard.start_index, shard.stop_index)
+                    for shard in shards
+                    if shard.job_id == current_job_id
+                ],
+            )
+            self._connection.execute("COMMIT")
+
+    def get_next_shard(self) -> Optional[FrameShard]:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE locks the database: two workers can not claim the same shard
+            self._connection.execute("BEGIN IMMEDIATE")
+            if self._shard_timeout is not None:
+                self._connection.execute(
+                    "UPDATE shards SET status = 'pending', claim_time = NULL "
+                    "WHERE status = 'running' AND claim_time < ?",
+                    (now - self._shard_timeout,),
+                )
+            row = self._connection.execute(
+                "SELECT shard_id, start_index, stop_index FROM shards WHERE status = 'pending' "
+                "ORDER BY shard_id LIMIT 1"
+            ).fetchone()
+            current_job_id = self._get_current_job_id()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE shards SET status = 'running', claim_time = ? WHERE shard_id = ?", (now, row[0])
+                )
+            self._connection.execute("COMMIT")
+        return FrameShard(*row, job_id=current_job_id) if row else None
+
+    def post_shard_result(self, shard: FrameShard, shard_result: List):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            # The result of a shard of a previous job is dropped
+            if shard.job_id == self._get_current_job_id():
+                self._connection.execute("UPDATE shards SET status = 'done' WHERE shard_id = ?", (shard.shard_id,))
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO results VALUES (?, ?)", (shard.shard_id, json.dumps(shard_result))
+                )
+            self._connection.execute("COMMIT")
+
+    def get_number_of_remaining_shards(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM shards WHERE status != 'done'").fetchone()[0]
+
+    def get_shard_results(self) -> Dict[int, List]:
+        with self._lock:
+            rows = self._connection.execute("SELECT shard_id, result FROM results").fetchall()
+        return {shard_id: json.loads(shard_result) for shard_id, shard_result in rows}
+
+
+class _AuthenticationSocket:
+    """
+    Socket with a timeout, framing its messages like a multiprocessing.connection.Connection (a 4 bytes big-endian
+    length, then the bytes), so that the challenge of the authentication key can be run on it.
+    A Connection reads its file descriptor directly and would ignore the timeout of the socket.
+    """
+
+    def __init__(self, client_socket: socket.socket):
+        self._socket = client_socket
+
+    def send_bytes(self, message: bytes):
+        self._socket.sendall(struct.pack("!i", len(message)) + message)
+
+    def recv_bytes(self, max_length: int) -> bytes:
+        (length,) = struct.unpack("!i", self._recv_exactly(4))
+        if not 0 <= length <= max_length:
+            raise OSError(f"Bad message length during the authentication: {length}")
+        return self._recv_exactly(length)
+
+    def _recv_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+
+class ShardQueueServer:
+    """
+    Serves a ShardQueue (usually a MemoryShardQueue) on a socket, so that workers on other machines can use it
+    through a SocketShardQueue. Each connection is handled by its own thread.
+    The clients must know the authentication key (it is checked with a challenge, the key itself is never sent).
+    The challenge runs in the thread of the connection: a client that does not answer it within
+    authentication_timeout seconds is disconnected, and never keeps the server from accepting the other ones.
+    The messages are JSON (and never pickled objects), so a message can not run code on the server.
+    """
+
+    _SERVED_METHODS = {
+        "set_job",
+        "get_job",
+        "put_shards",
+        "get_next_shard",
+        "post_shard_result",
+        "get_number_of_remaining_shards",
+        "get_shard_results",
+    }
+
+    def __init__(
+        self,
+        shard_queue: ShardQueue,
+        authkey: bytes,
+        address=("localhost", 6000),
+        authentication_timeout: float = 10.0,
+    ):
+        if not authkey:
+            raise ValueError("The shard queue server needs an authentication key.")
+        self._shard_queue = shard_queue
+        self._authkey = authkey
+        self._authentication_timeout = authentication_timeout
+        self._listening_socket = socket.create_server(address)
+
+    def get_address(self):
+        return self._listening_socket.getsockname()[:2]
+
+    def serve_forever(self):
+        while True:
+            try:
+                client_socket, _ = self._listening_socket.accept()
+            except ConnectionError:
+                # The client left before being accepted
+                continue
+            except OSError:
+                # The listening socket was closed
+                return
+            threading.Thread(target=self._handle_connection, args=(client_socket,), daemon=True).start()
+
+    def start_in_background(self) -> threading.Thread:
+        server_thread = threading.Thread(target=self.serve_forever, daemon=True)
+        server_thread.start()
+        return server_thread
+
+    def close(self):
+        self._listening_socket.close()
+
+    def _authenticate(self, client_socket: socket.socket) -> Optional[Connection]:
+        # Like multiprocessing.connection.Listener, the server checks the key of the client, and then proves its own
+        client_socket.settimeout(self._authentication_timeout)
+        try:
+            authentication_socket = _AuthenticationSocket(client_socket)
+            deliver_challenge(authentication_socket, self._authkey)
+            answer_challenge(authentication_socket, self._authkey)
+        except (AuthenticationError, AssertionError, EOFError, OSError):
+            # A client with a wrong key, that left or that stayed silent during the authentication is not served
+            client_socket.close()
+            return None
+        client_socket.settimeout(None)
+        return Connection(client_socket.detach())
+
+    def _handle_connection(self, client_socket: socket.socket):
+        connection = self._authenticate(client_socket)
+        if connection is None:
+            return
+        with connection:
+            while True:
+                try:
+                    request = json.loads(connection.recv_bytes())
+                except EOFError:
+                    return
+                except (OSError, ValueError):
+                    # The connection was lost, or the client does not speak the same protocol
+                    return
+                connection.send_bytes(json.dumps(self._handle_request(request)).encode())
+
+    def _handle_request(self, request) -> Dict:
+        method_name = request.get("method") if isinstance(request, dict) else None
+        if method_name not in self._SERVED_METHODS:
+            return {"error": f"The method {method_name} is not served."}
+        try:
+            args = request.get("args", [])
+            # The shards travel as dictionaries
+            if method_name == "put_shards":
+                args = [[FrameShard.from_dict(shard_as_dict) for shard_as_dict in args[0]]]
+            elif method_name == "post_shard_result":
+                args = [FrameShard.from_dict(args[0]), args[1]]
+            result = getattr(self._shard_queue, method_name)(*args)
+            if isinstance(result, FrameShard):
+                result = result.to_dict()
+            return {"result": result}
+        except Exception as error:
+            return {"error": f"{type(error).__name__}: {error}"}
+
+
+class SocketShardQueue(ShardQueue):
+    """
+    Client of a ShardQueueServer. The authentication key must be the one of the server.
+    """
+
+    def __init__(self, authkey: bytes, address=("localhost", 6000)):
+        if not authkey:
+            raise ValueError("The socket shard queue needs an authentication key.")
+        self._connection = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+
+    def _call(self, method_name: str, *args):
+        with self._lock:
+            self._connection.send_bytes(json.dumps({"method": method_name, "args": args}).encode())
+            response = json.loads(self._connection.recv_bytes())
+        if "error" in response:
+            raise RuntimeError(f"The shard queue server failed to run {method_name}: {response['error']}")
+        return response["result"]
+
+    def set_job(self, job_as_dict: Dict) -> str:
+        return self._call("set_job", job_as_dict)
+
+    def get_job(self) -> Optional[Tuple[str, Dict]]:
+        job = self._call("get_job")
+        return tuple(job) if job else None
+
+    def put_shards(self, shards: List[FrameShard]):
+        self._call("put_shards", [shard.to_dict() for shard in shards])
+
+    def get_next_shard(self) -> Optional[FrameShard]:
+        shard_as_dict = self._call("get_next_shard")
+        return FrameShard.from_dict(shard_as_dict) if shard_as_dict else None
+
+    def post_shard_result(self, shard: FrameShard, shard_result: List):
+        self._call("post_shard_result", shard.to_dict(), shard_result)
+
+    def get_number_of_remaining_shards(self) -> int:
+        return self._call("get_number_of_remaining_shards")
+
+    def get_shard_results(self) -> Dict[int, List]:
+        # The keys of a JSON object are strings
+        return {int(shard_id): shard_result for shard_id, shard_result in self._call("get_shard_results").items()}
+
+    def close(self):
+        self._connection.close()
+
+
+def create_shard_queue(queue_specification: str, shard_timeout: float = None, authkey: str = None) -> ShardQueue:
+    """
+    Creates the queue described by queue_specification, which is either:
+    - "sqlite:<path_to_database_file>"
+    - "socket:<host>:<port>", to connect to a running ShardQueueServer (see get_shard_queue_authkey for the key)
+    """
+    queue_type, _, queue_location = queue_specification.partition(":")
+    if queue_type == "sqlite":
+        return SqliteShardQueue(queue_location, shard_timeout=shard_timeout)
+
+    assert queue_type == "socket", f"Unknown queue type '{queue_type}'. The queue must be 'sqlite:...' or 'socket:...'"
+    return SocketShardQueue(get_shard_queue_authkey(authkey), parse_socket_address(queue_location))
+
+
+def get_shard_queue_authkey(authkey: str = None) -> bytes:
+    # The key given explicitly (e.g. with --authkey) has priority over the environment variable
+    authkey = authkey or os.environ.get(SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE)
+    if not authkey:
+        raise ValueError(
+            "The socket shard queue needs an authentication key, shared by the server and its clients: "
+            f"give it with --authkey or with the {SHARD_QUEUE_AUTHKEY_ENVIRONMENT_VARIABLE} environment variable."
+        )
+    return authkey.encode()
+
+
+def parse_socket_address(address_specification: str) -> Tuple[str, int]:
+    host, _, port = address_specification.rpartition(":")
+    return host or "localhost", int(port)
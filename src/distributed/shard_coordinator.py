@@ -0,0 +1,64 @@
+import time
+
+from data_types.data_types import TimedPoint2DPair
+from distributed.job_queue import FrameShard, ShardQueue
+from managers.experience_manager import ExperienceManager
+from managers.job_description import ExperienceJobDescription
+
+
+class ShardCoordinator:
+    """
+    Cuts the image pairs of an experience into shards of shard_size pairs and puts them in a queue.
+    Once the workers have posted the 2D coordinates found in every shard, the coordinator merges them and computes
+    the trajectory, the speed and the acceleration, in an ExperienceManager it keeps.
+    """
+
+    def __init__(self, shard_queue: ShardQueue, job_description: ExperienceJobDescription, shard_size: int = 500):
+        assert shard_size > 0, "The shards must contain at least one image pair."
+        self._shard_queue = shard_queue
+        self._job_description = job_description
+        self._shard_size = shard_size
+        self._experience_manager = job_description.create_experience_manager()
+
+    def get_experience_manager(self) -> ExperienceManager:
+        return self._experience_manager
+
+    def submit_shards(self) -> int:
+        number_of_image_pairs = self._experience_manager.get_number_of_image_pairs()
+        job_id = self._shard_queue.set_job(self._job_description.to_dict())
+        shards = [
+            FrameShard(shard_id, start_index, min(start_index + self._shard_size, number_of_image_pairs), job_id)
+            for shard_id, start_index in enumerate(range(0, number_of_image_pairs, self._shard_size))
+        ]
+        self._shard_queue.put_shards(shards)
+        return len(shards)
+
+    def wait_for_shard_results(self, poll_interval: float = 1.0, timeout: float = None):
+        start_time = time.monotonic()
+        while self._shard_queue.get_number_of_remaining_shards() > 0:
+            assert (
+                timeout is None or time.monotonic() - start_time < timeout
+            ), f"The workers did not process all the shards in {timeout} seconds."
+            time.sleep(poll_interval)
+
+    def merge_shard_results(self):
+        shard_results = self._shard_queue.get_shard_results()
+        # The shards ids follow the order of the image pairs: the merged coordinates are sorted in time
+        list_timed_pair_projectile_coordinates_2d = [
+            TimedPoint2DPair.from_list(timed_point2d_pair_as_list)
+            for shard_id in sorted(shard_results)
+            for timed_point2d_pair_as_list in shard_results[shard_id]
+        ]
+        self._experience_manager.set_list_timed_pair_projectile_coordinates_2d(
+            list_timed_pair_projectile_coordinates_2d
+        )
+
+    def compute_kinematics(self, poll_interval: float = 1.0, timeout: float = None) -> ExperienceManager:
+        self.submit_shards()
+        self.wait_for_shard_results(poll_interval=poll_interval, timeout=timeout)
+        self.merge_shard_results()
+
+        self._experience_manager.compute_trajectory()
+        self._experience_manager.compute_speed()
+        self._experience_manager.compute_acceleration()
+        return self._experience_manager
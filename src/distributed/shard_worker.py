@@ -0,0 +1,65 @@
+import time
+
+from distributed.job_queue import ShardQueue
+from managers.experience_manager import ExperienceManager
+from managers.job_description import ExperienceJobDescription
+
+
+class ShardWorker:
+    """
+    Pulls shards from a queue, finds the projectile in their image pairs, and posts back the 2D coordinates found.
+    The ExperienceManager is only built again when the job of the queue changes, so that its projectile finders and
+    buffers stay warm from one shard to the next.
+    """
+
+    def __init__(self, shard_queue: ShardQueue):
+        self._shard_queue = shard_queue
+        self._job_id: str = None
+        self._job_as_dict = None
+        self._job_description: ExperienceJobDescription = None
+        self._experience_manager: ExperienceManager = None
+
+    def _update_job(self, job_id: str) -> bool:
+        # Returns False if the job of the shard is not the current job of the queue anymore
+        if job_id == self._job_id:
+            return True
+        job = self._shard_queue.get_job()
+        if job is None or job[0] != job_id:
+            return False
+
+        self._job_id, job_as_dict = job
+        # The same job may be submitted again: the ExperienceManager is only built again if the settings changed
+        if job_as_dict != self._job_as_dict:
+            self._job_as_dict = job_as_dict
+            self._job_description = ExperienceJobDescription.from_dict(job_as_dict)
+            self._experience_manager = self._job_description.create_experience_manager()
+        return True
+
+    def process_next_shard(self) -> bool:
+        shard = self._shard_queue.get_next_shard()
+        if shard is None:
+            return False
+        if not self._update_job(shard.job_id):
+            # The job was replaced since the shard was given: the shard does not need to be processed anymore
+            return True
+
+        list_timed_pair_projectile_coordinates_2d = (
+            self._experience_manager.extract_projectile_2d_coordinates_in_frame_range(
+                shard.start_index,
+                shard.stop_index,
+                *self._job_description.finder_args,
+                **self._job_description.finder_kwargs,
+            )
+        )
+        self._shard_queue.post_shard_result(
+            shard,
+            [timed_point2d_pair.to_list() for timed_point2d_pair in list_timed_pair_projectile_coordinates_2d],
+        )
+        return True
+
+    def run(self, poll_interval: float = 1.0, stop_when_idle: bool = False):
+        while True:
+            if not self.process_next_shard():
+                if stop_when_idle:
+                    return
+                time.sleep(poll_interval)
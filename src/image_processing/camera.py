@@ -1,7 +1,12 @@
+import cv2 as cv
 import numpy as np
 
 from configuration_reader import Config
-from src.constants import CameraIdentifier
+from src.constants import VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS, CameraIdentifier
+
+# The undistortion is iterative: strong (wide angle) distortions need more than the 5 iterations of undistortPoints
+UNDISTORTION_MAX_ITERATIONS = 100
+UNDISTORTION_EPSILON_IN_PIXELS = 1e-4
 
 
 class HighSpeedCamera:
@@ -10,6 +15,9 @@ class HighSpeedCamera:
         self.extrinsic_matrix = extrinsic_matrix
         self.framerate = None
         self.identifier = CameraIdentifier.UNDEFINED
+        self.distortion_coefficients: np.ndarray = None
+        # Precomputed once, so that undistorting the points found in an image costs (almost) nothing
+        self._undistortion_parameters = None
 
     def set_intrinsic_matrix(self, new_intrinsic_matrix):
         assert new_intrinsic_matrix.shape == (
@@ -17,6 +25,7 @@ class HighSpeedCamera:
             3,
         ), f"Incorrect size: expected (3,3), got {new_intrinsic_matrix.shape}."
         self.intrinsic_matrix = new_intrinsic_matrix
+        self._update_undistortion_parameters()
 
     def set_extrinsic_matrix(self, new_extrinsic_matrix):
         assert new_extrinsic_matrix.shape == (
@@ -25,6 +34,54 @@ class HighSpeedCamera:
         ), f"Incorrect size: expected (3,4), got {new_extrinsic_matrix.shape}."
         self.extrinsic_matrix = new_extrinsic_matrix
 
+    def set_distortion_coefficients(self, new_distortion_coefficients: np.ndarray):
+        number_of_coefficients = np.size(new_distortion_coefficients)
+        assert (
+            new_distortion_coefficients is None or number_of_coefficients in VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS
+        ), (
+            f"Incorrect number of distortion coefficients: expected one of {VALID_NUMBERS_OF_DISTORTION_COEFFICIENTS}, "
+            f"got {number_of_coefficients}."
+        )
+        self.distortion_coefficients = new_distortion_coefficients
+        self._update_undistortion_parameters()
+
+    def _update_undistortion_parameters(self):
+        if self.distortion_coefficients is None or not np.any(self.distortion_coefficients):
+            self._undistortion_parameters = None
+            return
+
+        intrinsic_matrix = np.ascontiguousarray(self.intrinsic_matrix, dtype=np.float64)
+        distortion_coefficients = np.ascontiguousarray(self.distortion_coefficients, dtype=np.float64).reshape(-1)
+        termination_criteria = (
+            cv.TERM_CRITERIA_COUNT | cv.TERM_CRITERIA_EPS,
+            UNDISTORTION_MAX_ITERATIONS,
+            UNDISTORTION_EPSILON_IN_PIXELS,
+        )
+        self._undistortion_parameters = (intrinsic_matrix, distortion_coefficients, np.eye(3), termination_criteria)
+
+    def undistort_points(self, points_2d: np.ndarray) -> np.ndarray:
+        """
+        Removes the lens distortion of a batch of points of shape (N, 2), given in pixels.
+        The undistorted points are given in pixels too, in the image of the ideal pinhole camera.
+        Only the points are undistorted (and not the whole image), which is much cheaper.
+        """
+        if self._undistortion_parameters is None:
+            return points_2d
+
+        intrinsic_matrix, distortion_coefficients, rectification_matrix, termination_criteria = (
+            self._undistortion_parameters
+        )
+        # The iterations stop when the undistorted point, distorted again, is close enough to the detected one
+        undistorted_points = cv.undistortPointsIter(
+            np.ascontiguousarray(points_2d, dtype=np.float64).reshape((-1, 1, 2)),
+            intrinsic_matrix,
+            distortion_coefficients,
+            rectification_matrix,
+            intrinsic_matrix,
+            termination_criteria,
+        )
+        return undistorted_points.reshape((-1, 2))
+
     def set_framerate(self, new_framerate):
         self.framerate = new_framerate
 
@@ -58,6 +115,9 @@ class CameraSetup:
             extrinsic_matrix=config.right_camera_config.extrinsic_matrix,
         )
 
+        self.left_camera.set_distortion_coefficients(config.left_camera_config.distortion_coefficients)
+        self.right_camera.set_distortion_coefficients(config.right_camera_config.distortion_coefficients)
+
         self.left_camera.set_framerate(config.left_camera_config.framerate)
         self.right_camera.set_framerate(config.right_camera_config.framerate)
 
@@ -0,0 +1,138 @@
+from abc import ABC, abstractmethod
+
+import cv2 as cv
+import numpy as np
+
+from constants import AvailableFramePreFilterMethods
+from utils.utils import get_reusable_buffer
+
+# The frame pre-filters decide cheaply, on a downsampled image, whether a frame may contain the projectile.
+# The frames that do not pass are not given to the (expensive) projectile finder.
+# If you wish to add another pre-filter you need to :
+# 1- Add another enumeration type in the constants file
+# 2- Add the FramePreFilter class to the mapping dictionary in the FramePreFilters class (see below)
+# A pre-filter must never reject a frame holding the projectile: the thresholds should rather be too permissive.
+
+
+class FramePreFilter(ABC):
+    """
+    Base class of the frame pre-filters. A pre-filter is called with the image (in grayscale or in BGR) and returns
+    True if the image may contain the projectile.
+    Like the ProjectileFinder, it owns work buffers that are reused at every image.
+    """
+
+    def __init__(self, downsampling_factor: int = 4):
+        assert downsampling_factor >= 1, "The downsampling factor must be greater or equal to 1."
+        self.downsampling_factor = downsampling_factor
+        self._work_buffers = {}
+
+    def _get_work_buffer(self, name: str, shape, dtype=np.uint8) -> np.ndarray:
+        self._work_buffers[name] = get_reusable_buffer(self._work_buffers.get(name), shape, dtype)
+        return self._work_buffers[name]
+
+    def _downsample_to_grayscale(self, image: np.ndarray) -> np.ndarray:
+        # The image is downsampled first (INTER_AREA averages the pixels, so a small projectile is not lost),
+        # then converted to grayscale: the color conversion is done on the small image only.
+        height, width = image.shape[:2]
+        small_height = max(1, height // self.downsampling_factor)
+        small_width = max(1, width // self.downsampling_factor)
+        downsampled_image = self._get_work_buffer(
+            "downsampled_image", (small_height, small_width) + image.shape[2:], image.dtype
+        )
+        cv.resize(image, (small_width, small_height), dst=downsampled_image, interpolation=cv.INTER_AREA)
+        if len(image.shape) == 2:
+            return downsampled_image
+
+        downsampled_grayscale = self._get_work_buffer("downsampled_grayscale", (small_height, small_width), image.dtype)
+        return cv.cvtColor(downsampled_image, cv.COLOR_BGR2GRAY, dst=downsampled_grayscale)
+
+    def reset(self):
+        # Called when the next image does not follow the previous one (e.g. a new range of frames)
+        pass
+
+    @abstractmethod
+    def __call__(self, image: np.ndarray) -> bool:
+        pass
+
+
+class FramePreFilters:
+    def __init__(self):
+        # This is the mapping to be updated if you wish to add another pre-filter
+        self._prefilter_mapping = {
+            AvailableFramePreFilterMethods.FRAME_DIFFERENCE: FrameDifferencePreFilter,
+            AvailableFramePreFilterMethods.INTENSITY_STATISTICS: IntensityStatisticsPreFilter,
+        }
+
+    def get_frame_prefilter(self, prefilter_method: AvailableFramePreFilterMethods, **prefilter_parameters):
+        assert (
+            prefilter_method in self._prefilter_mapping
+        ), "The pre-filter you are looking for seems to be not implemented yet."
+        # A new instance is created every time, so two cameras never share their previous frames or buffers
+        return self._prefilter_mapping[prefilter_method](**prefilter_parameters)
+
+
+class FrameDifferencePreFilter(FramePreFilter):
+    """
+    Compares the downsampled image with the downsampled previous image of the same camera.
+    The image passes if at least min_changed_pixels pixels changed by more than difference_threshold.
+    A moving projectile always changes some pixels, whereas the static background does not.
+    The first image (or the first one after a reset) always passes.
+    Warning: a projectile that does not move (e.g. before the launch) is not seen by this pre-filter.
+    """
+
+    def __init__(self, downsampling_factor: int = 4, difference_threshold: int = 15, min_changed_pixels: int = 1):
+        super().__init__(downsampling_factor)
+        self.difference_threshold = difference_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self._has_previous_image = False
+
+    def reset(self):
+        self._has_previous_image = False
+
+    def __call__(self, image: np.ndarray) -> bool:
+        downsampled_image = self._downsample_to_grayscale(image)
+        previous_image = self._work_buffers.get("previous_image")
+        has_comparable_previous_image = (
+            self._has_previous_image
+            and previous_image.shape == downsampled_image.shape
+            and previous_image.dtype == downsampled_image.dtype
+        )
+
+        may_contain_projectile = True
+        if has_comparable_previous_image:
+            difference = self._get_work_buffer("difference", downsampled_image.shape, downsampled_image.dtype)
+            cv.absdiff(downsampled_image, previous_image, dst=difference)
+            changed_pixels_mask = self._get_work_buffer(
+                "changed_pixels_mask", downsampled_image.shape, downsampled_image.dtype
+            )
+            cv.threshold(difference, self.difference_threshold, 1, cv.THRESH_BINARY, dst=changed_pixels_mask)
+            may_contain_projectile = cv.countNonZero(changed_pixels_mask) >= self.min_changed_pixels
+
+        previous_image = self._get_work_buffer("previous_image", downsampled_image.shape, downsampled_image.dtype)
+        np.copyto(previous_image, downsampled_image)
+        self._has_previous_image = True
+        return may_contain_projectile
+
+
+class IntensityStatisticsPreFilter(FramePreFilter):
+    """
+    Looks at the intensity statistics of the downsampled image, restricted to a region if one is given.
+    The image passes if its brightest pixel is brighter than its mean by at least min_contrast: the projectile
+    (painted in a fluorescent color) is expected to be brighter than the background.
+    The region is given as (x, y, width, height), in pixels of the full size image.
+    Unlike the FrameDifferencePreFilter, it does not depend on the previous image.
+    """
+
+    def __init__(self, downsampling_factor: int = 4, min_contrast: float = 40, region=None):
+        super().__init__(downsampling_factor)
+        self.min_contrast = min_contrast
+        self.region = region
+
+    def __call__(self, image: np.ndarray) -> bool:
+        if self.region is not None:
+            x, y, width, height = self.region
+            image = image[y : y + height, x : x + width]
+        downsampled_image = self._downsample_to_grayscale(image)
+        _, max_intensity, _, _ = cv.minMaxLoc(downsampled_image)
+        mean_intensity = cv.mean(downsampled_image)[0]
+        return max_intensity - mean_intensity >= self.min_contrast
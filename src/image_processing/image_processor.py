@@ -1,11 +1,18 @@
 import cv2 as cv
 import numpy as np
 
-from constants import AvailableProjectileFinderMethods
+from constants import (
+    AvailableFramePreFilterMethods,
+    AvailableProjectileFinderMethods,
+    AvailableProjectileRefinementMethods,
+)
 from data_types.data_types import ImagePair, Pair, Point2D, Point2DPair
 from image_processing.camera import CameraSetup, HighSpeedCamera
+from image_processing.frame_prefilter import FramePreFilter, FramePreFilters
 from image_processing.projectile_finder import ProjectileFinders
+from image_processing.projectile_refiner import ProjectileRefiners
 from src.constants import ColorDomain
+from utils.utils import get_reusable_buffer
 
 
 class ImageProcessor:
@@ -13,8 +20,12 @@ class ImageProcessor:
         self.image: np.ndarray = None
         self.associated_camera: HighSpeedCamera = None
         self.projectile_finder_function: callable = None
+        self.projectile_refinement_function: callable = None
+        self.refinement_window_half_size: int = None
+        self.frame_prefilter: FramePreFilter = None
         self.is_grayscale: bool = None
         self.color_domain_to_find_projectile: ColorDomain = None
+        self._grayscale_image_buffer: np.ndarray = None
 
     def set_image(self, new_image: np.ndarray):
         self.image = new_image
@@ -29,16 +40,61 @@ class ImageProcessor:
     def set_projectile_finder_function(self, projectile_finder_function: AvailableProjectileFinderMethods):
         self.projectile_finder_function = ProjectileFinders().get_projectile_finder_function(projectile_finder_function)
 
+    def set_projectile_refinement_function(
+        self, projectile_refinement_function: AvailableProjectileRefinementMethods, window_half_size: int
+    ):
+        if projectile_refinement_function is None:
+            self.projectile_refinement_function = None
+        else:
+            assert (
+                window_half_size is not None and window_half_size > 0
+            ), "The refinement window size must be given, e.g. with get_refinement_window_half_size(max_radius)."
+            self.projectile_refinement_function = ProjectileRefiners().get_projectile_refinement_function(
+                projectile_refinement_function
+            )
+        self.refinement_window_half_size = window_half_size
+
+    def set_frame_prefilter(self, frame_prefilter_method: AvailableFramePreFilterMethods, **prefilter_parameters):
+        if frame_prefilter_method is None:
+            self.frame_prefilter = None
+        else:
+            self.frame_prefilter = FramePreFilters().get_frame_prefilter(frame_prefilter_method, **prefilter_parameters)
+
+    def reset_frame_prefilter(self):
+        if self.frame_prefilter is not None:
+            self.frame_prefilter.reset()
+
+    def may_contain_projectile(self) -> bool:
+        # Without pre-filter, every image is given to the projectile finder
+        if self.frame_prefilter is None:
+            return True
+        return self.frame_prefilter(self.image)
+
     def find_projectile(self, *args, **kwargs) -> Point2D:
+        # The refinement is given the same image as the finder: a color image is never converted as a whole for it,
+        # the refinement only converts its window to grayscale
         if self.color_domain_to_find_projectile == ColorDomain.RGB:
-            projectile = self.projectile_finder_function(self.image, *args, **kwargs)
+            image_to_process = self.image
         else:
-            projectile = self.projectile_finder_function(self.image_to_grayscale(), *args, **kwargs)
+            image_to_process = self.image_to_grayscale()
+        projectile = self.projectile_finder_function(image_to_process, *args, **kwargs)
+
+        if self.projectile_refinement_function is not None and projectile.is_valid():
+            projectile = self.projectile_refinement_function(
+                image_to_process, projectile, self.refinement_window_half_size
+            )
 
         return projectile
 
     def image_to_grayscale(self) -> np.ndarray:
-        return self.image if self.is_grayscale else cv.cvtColor(self.image, cv.COLOR_BGR2GRAY)
+        if self.is_grayscale:
+            return self.image
+
+        # The conversion is written in a buffer that is reused as long as the images keep the same size
+        self._grayscale_image_buffer = get_reusable_buffer(
+            self._grayscale_image_buffer, self.image.shape[:2], self.image.dtype
+        )
+        return cv.cvtColor(self.image, cv.COLOR_BGR2GRAY, dst=self._grayscale_image_buffer)
 
 
 class ImagePairProcessor:
@@ -46,6 +102,7 @@ class ImagePairProcessor:
         self.camera_setup: CameraSetup = None
         self._pair_image_processor = Pair(ImageProcessor(), ImageProcessor())
         self.projectile_finder_method: AvailableProjectileFinderMethods = None
+        self._frame_prefilter_statistics = _get_empty_frame_prefilter_statistics()
 
     def set_camera_setup(self, new_camera_setup: CameraSetup):
         self.camera_setup = new_camera_setup
@@ -66,6 +123,9 @@ class ImagePairProcessor:
         self._pair_image_processor.left.color_domain_to_find_projectile = new_color_domain
         self._pair_image_processor.right.color_domain_to_find_projectile = new_color_domain
 
+    def get_color_domain_to_find_projectile(self) -> ColorDomain:
+        return self._pair_image_processor.left.color_domain_to_find_projectile
+
     def get_camera_setup(self):
         return self.camera_setup
 
@@ -79,8 +139,66 @@ class ImagePairProcessor:
         self._pair_image_processor.left.set_projectile_finder_function(new_projectile_finder_method)
         self._pair_image_processor.right.set_projectile_finder_function(new_projectile_finder_method)
 
+    def set_projectile_refinement_method(
+        self, new_projectile_refinement_method: AvailableProjectileRefinementMethods, window_half_size: int
+    ):
+        self._pair_image_processor.left.set_projectile_refinement_function(
+            new_projectile_refinement_method, window_half_size
+        )
+        self._pair_image_processor.right.set_projectile_refinement_function(
+            new_projectile_refinement_method, window_half_size
+        )
+
+    def set_frame_prefilter_method(
+        self, new_frame_prefilter_method: AvailableFramePreFilterMethods, **prefilter_parameters
+    ):
+        self._pair_image_processor.left.set_frame_prefilter(new_frame_prefilter_method, **prefilter_parameters)
+        self._pair_image_processor.right.set_frame_prefilter(new_frame_prefilter_method, **prefilter_parameters)
+        self.reset_frame_prefilter_statistics()
+
+    def reset_frame_prefilter(self):
+        # To be called when the next image pair does not follow the previous one
+        self._pair_image_processor.left.reset_frame_prefilter()
+        self._pair_image_processor.right.reset_frame_prefilter()
+
+    def reset_frame_prefilter_statistics(self):
+        self._frame_prefilter_statistics = _get_empty_frame_prefilter_statistics()
+
+    def get_frame_prefilter_statistics(self) -> dict:
+        statistics = dict(self._frame_prefilter_statistics)
+        number_of_image_pairs = statistics["number_of_image_pairs"]
+        statistics["skip_rate"] = (
+            statistics["number_of_skipped_image_pairs"] / number_of_image_pairs if number_of_image_pairs else 0.0
+        )
+        return statistics
+
     def find_projectile_in_images(self, *args, **kwargs) -> Point2DPair:
+        # Both images are always given to their pre-filter, so that each one keeps track of its previous image.
+        # A projectile seen by one camera only cannot be reconstructed: the pair is skipped if one image is rejected.
+        left_may_contain_projectile = self._pair_image_processor.left.may_contain_projectile()
+        right_may_contain_projectile = self._pair_image_processor.right.may_contain_projectile()
+        self._update_frame_prefilter_statistics(left_may_contain_projectile, right_may_contain_projectile)
+        if not (left_may_contain_projectile and right_may_contain_projectile):
+            return Point2DPair(Point2D(), Point2D())
+
         projectile_in_left_image = self._pair_image_processor.left.find_projectile(*args, **kwargs)
         projectile_in_right_image = self._pair_image_processor.right.find_projectile(*args, **kwargs)
 
         return Point2DPair(projectile_in_left_image, projectile_in_right_image)
+
+    def _update_frame_prefilter_statistics(self, left_may_contain_projectile: bool, right_may_contain_projectile: bool):
+        self._frame_prefilter_statistics["number_of_image_pairs"] += 1
+        self._frame_prefilter_statistics["number_of_rejected_left_images"] += not left_may_contain_projectile
+        self._frame_prefilter_statistics["number_of_rejected_right_images"] += not right_may_contain_projectile
+        self._frame_prefilter_statistics["number_of_skipped_image_pairs"] += not (
+            left_may_contain_projectile and right_may_contain_projectile
+        )
+
+
+def _get_empty_frame_prefilter_statistics() -> dict:
+    return {
+        "number_of_image_pairs": 0,
+        "number_of_skipped_image_pairs": 0,
+        "number_of_rejected_left_images": 0,
+        "number_of_rejected_right_images": 0,
+    }
@@ -1,18 +1,48 @@
+import inspect
+from abc import ABC, abstractmethod
+
 import cv2 as cv
+import numpy as np
 
-from constants import AvailableProjectileFinderMethods
+from constants import (
+    DEFAULT_PROJECTILE_LOWER_HSV_COLOR,
+    DEFAULT_PROJECTILE_UPPER_HSV_COLOR,
+    AvailableProjectileFinderMethods,
+)
 from data_types.data_types import Point2D
+from utils.utils import get_reusable_buffer
 
 # If you wish to add another function to find the projectiles you need to :
 # 1- Add another enumeration type in the constants file
-# 2- Add the function to the mapping dictionary in the ProjectileFinders class (see below)
+# 2- Add the function (or ProjectileFinder class) to the mapping dictionary in the ProjectileFinders class (see below)
+
+
+class ProjectileFinder(ABC):
+    """
+    Base class of the projectile finders that keep a state from one image to the next one.
+    Its main purpose is to own work buffers that are reused at every image, instead of letting opencv allocate new
+    images every time (which is expensive when processing thousands of images).
+    A new instance is created every time it is asked to ProjectileFinders, so two cameras never share their buffers.
+    """
+
+    def __init__(self):
+        self._work_buffers = {}
+
+    def _get_work_buffer(self, name: str, shape, dtype=np.uint8) -> np.ndarray:
+        self._work_buffers[name] = get_reusable_buffer(self._work_buffers.get(name), shape, dtype)
+        return self._work_buffers[name]
+
+    @abstractmethod
+    def __call__(self, image: np.ndarray, *args, **kwargs) -> Point2D:
+        pass
 
 
 class ProjectileFinders:
     def __init__(self):
         # This is the function mapping to be updated if you wish to add another projectile finder function
         self._finder_function_mapping = {
-            AvailableProjectileFinderMethods.FIND_CIRCLES: find_circles_in_image_coordinates,
+            AvailableProjectileFinderMethods.FIND_CIRCLES: CircleFinder,
+            AvailableProjectileFinderMethods.FIND_COLOR_BLOB: ColorBlobFinder,
             AvailableProjectileFinderMethods.DUMMY_METHOD_EXAMPLE: dummy_example,
         }
 
@@ -20,12 +50,97 @@ class ProjectileFinders:
         assert (
             finder_function in self._finder_function_mapping
         ), "The function you are looking for seems to be not implemented yet."
-        return self._finder_function_mapping[finder_function]
+        projectile_finder = self._finder_function_mapping[finder_function]
+        if inspect.isclass(projectile_finder) and issubclass(projectile_finder, ProjectileFinder):
+            return projectile_finder()
+        return projectile_finder
+
+
+class CircleFinder(ProjectileFinder):
+    """
+    Same as find_circles_in_image_coordinates, but the blurred image is written in a buffer owned by the finder.
+    """
+
+    def __call__(self, img_grayscale, min_radius=None, max_radius=None) -> Point2D:
+        blurred_image = self._get_work_buffer("blurred_image", img_grayscale.shape, img_grayscale.dtype)
+        cv.GaussianBlur(img_grayscale, (9, 9), 2, dst=blurred_image)
+        return _find_circles_in_blurred_image(blurred_image, min_radius, max_radius)
+
+
+class ColorBlobFinder(ProjectileFinder):
+    """
+    Keeps the pixels whose HSV color is in [lower_hsv_color, upper_hsv_color] and returns the sub-pixel centroid
+    (given by the connected components analysis) of the largest blob.
+    It is made for painted projectiles, and is much cheaper than the blur + Hough transform of the CircleFinder.
+    The image must be in color (as read by opencv, in BGR): use it with ColorDomain.RGB.
+    If the lower hue is greater than the upper hue, the hue range wraps around 0 (useful for red colors).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._hsv_bounds_cache = {}
+
+    def _get_hsv_bounds(self, lower_hsv_color, upper_hsv_color):
+        # The bounds are converted once, and not at every image
+        key = (tuple(lower_hsv_color), tuple(upper_hsv_color))
+        if key not in self._hsv_bounds_cache:
+            lower_bound = np.array(lower_hsv_color, dtype=np.uint8)
+            upper_bound = np.array(upper_hsv_color, dtype=np.uint8)
+            if lower_bound[0] <= upper_bound[0]:
+                hue_ranges = [(lower_bound, upper_bound)]
+            else:
+                hue_ranges = [
+                    (lower_bound, np.array([179, upper_bound[1], upper_bound[2]], dtype=np.uint8)),
+                    (np.array([0, lower_bound[1], lower_bound[2]], dtype=np.uint8), upper_bound),
+                ]
+            self._hsv_bounds_cache[key] = hue_ranges
+        return self._hsv_bounds_cache[key]
+
+    def __call__(
+        self,
+        img_bgr,
+        lower_hsv_color=DEFAULT_PROJECTILE_LOWER_HSV_COLOR,
+        upper_hsv_color=DEFAULT_PROJECTILE_UPPER_HSV_COLOR,
+        min_area=20,
+    ) -> Point2D:
+        assert (
+            img_bgr.ndim == 3
+        ), "The color blob finder needs a color image. Use ColorDomain.RGB to find the projectile."
+        image_shape = img_bgr.shape[:2]
+
+        hsv_image = self._get_work_buffer("hsv_image", img_bgr.shape, np.uint8)
+        cv.cvtColor(img_bgr, cv.COLOR_BGR2HSV, dst=hsv_image)
+
+        mask = self._get_work_buffer("mask", image_shape, np.uint8)
+        hue_ranges = self._get_hsv_bounds(lower_hsv_color, upper_hsv_color)
+        cv.inRange(hsv_image, *hue_ranges[0], dst=mask)
+        if len(hue_ranges) > 1:
+            wrapped_mask = self._get_work_buffer("wrapped_mask", image_shape, np.uint8)
+            cv.inRange(hsv_image, *hue_ranges[1], dst=wrapped_mask)
+            cv.bitwise_or(mask, wrapped_mask, dst=mask)
+
+        labels = self._get_work_buffer("labels", image_shape, np.int32)
+        number_of_labels, labels, stats, centroids = cv.connectedComponentsWithStats(
+            mask, labels=labels, connectivity=8, ltype=cv.CV_32S
+        )
+        # The label 0 is the background
+        if number_of_labels < 2:
+            return Point2D()
+        largest_blob_label = 1 + int(np.argmax(stats[1:, cv.CC_STAT_AREA]))
+        if stats[largest_blob_label, cv.CC_STAT_AREA] < min_area:
+            return Point2D()
+
+        # The centroids are the sub-pixel centers of mass of the blobs (first order moments)
+        centroid_x, centroid_y = centroids[largest_blob_label]
+        return Point2D(float(centroid_x), float(centroid_y))
 
 
 def find_circles_in_image_coordinates(img_grayscale, min_radius=None, max_radius=None) -> Point2D:
     blurred_image = cv.GaussianBlur(img_grayscale, (9, 9), 2)
+    return _find_circles_in_blurred_image(blurred_image, min_radius, max_radius)
+
 
+def _find_circles_in_blurred_image(blurred_image, min_radius=None, max_radius=None) -> Point2D:
     circles = cv.HoughCircles(
         image=blurred_image,
         method=cv.HOUGH_GRADIENT,
@@ -0,0 +1,127 @@
+import cv2 as cv
+import numpy as np
+
+from constants import MAD_TO_STANDARD_DEVIATION, AvailableProjectileRefinementMethods
+from data_types.data_types import Point2D
+
+# The refinement functions improve the position found by a projectile finder, by looking at a small window around it.
+# This allows to use cheap (and coarse) projectile finders while keeping a sub-pixel precision.
+# If you wish to add another refinement function you need to :
+# 1- Add another enumeration type in the constants file
+# 2- Add the function to the mapping dictionary in the ProjectileRefiners class (see below)
+# The function takes as parameters the image (grayscale, or BGR: only the window is then converted to grayscale),
+# the Point2D found and the half size of the window (in pixels). It returns the refined Point2D.
+# The window must contain the whole projectile: when its border does not lie on the background, the detection is
+# returned unchanged. Use get_refinement_window_half_size to derive the size from the radius given to the finder.
+
+# Number of pixels kept between the projectile and the border of the window
+DEFAULT_REFINEMENT_WINDOW_MARGIN = 5
+# Above this fraction of border pixels that differ from the background, the window does not contain the projectile
+_MAX_FRACTION_OF_BORDER_ON_PROJECTILE = 0.25
+
+
+class ProjectileRefiners:
+    def __init__(self):
+        # This is the function mapping to be updated if you wish to add another refinement function
+        self._refinement_function_mapping = {
+            AvailableProjectileRefinementMethods.INTENSITY_CENTROID: refine_with_intensity_centroid,
+            AvailableProjectileRefinementMethods.EDGE_CIRCLE_FIT: refine_with_edge_circle_fit,
+        }
+
+    def get_projectile_refinement_function(self, refinement_function: AvailableProjectileRefinementMethods):
+        assert (
+            refinement_function in self._refinement_function_mapping
+        ), "The refinement function you are looking for seems to be not implemented yet."
+        return self._refinement_function_mapping[refinement_function]
+
+
+def get_refinement_window_half_size(max_radius: float, margin: int = DEFAULT_REFINEMENT_WINDOW_MARGIN) -> int:
+    # max_radius is the largest radius (in pixels) the projectile can have, e.g. the max_radius of the finder
+    return int(np.ceil(max_radius)) + margin
+
+
+def _get_window_around_point(image: np.ndarray, point: Point2D, window_half_size: int):
+    height, width = image.shape[:2]
+    center_x, center_y = int(round(point.x)), int(round(point.y))
+    x_min, x_max = max(center_x - window_half_size, 0), min(center_x + window_half_size + 1, width)
+    y_min, y_max = max(center_y - window_half_size, 0), min(center_y + window_half_size + 1, height)
+    window = image[y_min:y_max, x_min:x_max]
+    # Converting the window only is much cheaper than converting the whole color image
+    if window.ndim == 3 and window.size > 0:
+        window = cv.cvtColor(window, cv.COLOR_BGR2GRAY)
+    return window.astype(np.float32), x_min, y_min
+
+
+def _get_window_border(window: np.ndarray) -> np.ndarray:
+    return np.concatenate([window[0, :], window[-1, :], window[1:-1, 0], window[1:-1, -1]])
+
+
+def _is_border_on_background(window: np.ndarray, border: np.ndarray, point: Point2D, x_min: int, y_min: int) -> bool:
+    background_level = np.median(border)
+    noise = max(MAD_TO_STANDARD_DEVIATION * np.median(np.abs(border - background_level)), 1.0)
+    contrast_threshold = 3 * noise
+
+    # Too many border pixels differ from the background: the window is smaller than the projectile
+    if np.mean(np.abs(border - background_level) > contrast_threshold) > _MAX_FRACTION_OF_BORDER_ON_PROJECTILE:
+        return False
+
+    # The detection does not differ from the border: the whole window may lie on the projectile
+    center_x, center_y = int(round(point.x)) - x_min, int(round(point.y)) - y_min
+    center = window[max(center_y - 1, 0) : center_y + 2, max(center_x - 1, 0) : center_x + 2]
+    return center.size > 0 and abs(center.mean() - background_level) > contrast_threshold
+
+
+def refine_with_intensity_centroid(image, point: Point2D, window_half_size: int) -> Point2D:
+    window, x_min, y_min = _get_window_around_point(image, point, window_half_size)
+    if window.shape[0] < 3 or window.shape[1] < 3:
+        return point
+
+    # The border of the window gives the background level.
+    # The projectile can be brighter or darker than the background, so the weights are the distance to this level.
+    border = _get_window_border(window)
+    if not _is_border_on_background(window, border, point, x_min, y_min):
+        return point
+    weights = np.abs(window - np.median(border))
+    # The weakest weights are the noise of the background, they would bias the centroid towards the window center
+    weights[weights < 0.5 * weights.max()] = 0
+
+    total_weight = weights.sum()
+    if total_weight == 0:
+        return point
+
+    centroid_x = weights.sum(axis=0) @ np.arange(window.shape[1]) / total_weight
+    centroid_y = weights.sum(axis=1) @ np.arange(window.shape[0]) / total_weight
+    return Point2D(x_min + float(centroid_x), y_min + float(centroid_y))
+
+
+def refine_with_edge_circle_fit(image, point: Point2D, window_half_size: int) -> Point2D:
+    window, x_min, y_min = _get_window_around_point(image, point, window_half_size)
+    if window.shape[0] < 3 or window.shape[1] < 3:
+        return point
+    # Without the whole projectile in the window, the strongest gradients are not its edges
+    if not _is_border_on_background(window, _get_window_border(window), point, x_min, y_min):
+        return point
+
+    gradient_x = cv.Sobel(window, cv.CV_32F, 1, 0, ksize=3)
+    gradient_y = cv.Sobel(window, cv.CV_32F, 0, 1, ksize=3)
+    gradient_magnitude = cv.magnitude(gradient_x, gradient_y)
+    if gradient_magnitude.max() == 0:
+        return point
+
+    edge_y, edge_x = np.nonzero(gradient_magnitude >= 0.5 * gradient_magnitude.max())
+    if len(edge_x) < 3:
+        return point
+
+    # Algebraic circle fit (x^2 + y^2 + D*x + E*y + F = 0) of the edge pixels, weighted by the gradient magnitude.
+    # This is a linear least squares problem, and the center of the circle is (-D/2, -E/2).
+    sqrt_weights = np.sqrt(gradient_magnitude[edge_y, edge_x])
+    edge_x, edge_y = edge_x.astype(float), edge_y.astype(float)
+    design_matrix = np.column_stack([edge_x, edge_y, np.ones_like(edge_x)]) * sqrt_weights[:, np.newaxis]
+    right_hand_side = -(edge_x**2 + edge_y**2) * sqrt_weights
+    (d, e, _), *_ = np.linalg.lstsq(design_matrix, right_hand_side, rcond=None)
+
+    center_x, center_y = -d / 2, -e / 2
+    # A center outside of the window means the edges were not the ones of the projectile: we keep the detection
+    if not (0 <= center_x < window.shape[1] and 0 <= center_y < window.shape[0]):
+        return point
+    return Point2D(x_min + float(center_x), y_min + float(center_y))
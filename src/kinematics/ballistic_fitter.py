@@ -0,0 +1,302 @@
+from typing import List
+
+import numpy as np
+from scipy.optimize import least_squares
+from scipy.sparse import identity, kron
+
+from constants import AvailableBallisticModels
+
+# A parabola needs at least 3 points per axis to be determined.
+MINIMAL_NUMBER_OF_POINTS_TO_FIT = 3
+
+# Standard acceleration of gravity, in m/s^2.
+STANDARD_GRAVITY = 9.81
+
+# Launch position (3), launch velocity (3) and drag coefficient (1). The gravity is not fitted: over a short trajectory,
+# a drag along the velocity and a gravity tilted towards the velocity fit the points equally well.
+_NUMBER_OF_QUADRATIC_DRAG_PARAMETERS = 7
+
+# The residuals are 3D: for a gaussian noise of standard deviation sigma on each axis, their norms follow sigma times
+# a chi distribution with 3 degrees of freedom, whose median is this value.
+_MEDIAN_OF_3D_RESIDUAL_NORMS_IN_STANDARD_DEVIATIONS = 1.5382
+
+
+class BallisticFitResult:
+    """
+    Result of the fit of a ballistic model on a single trajectory.
+    All the launch quantities are expressed at the time of the first point of the trajectory (launch_time).
+    For the parabolic model, the drag coefficient is 0 and the gravity is the (constant) fitted acceleration.
+    For the quadratic drag model, the acceleration is gravity - drag_coefficient * |v| * v, where gravity is the one
+    given to (or estimated by) the fit.
+    """
+
+    def __init__(
+        self,
+        ballistic_model: AvailableBallisticModels,
+        launch_time: float,
+        launch_position: np.ndarray,
+        launch_velocity: np.ndarray,
+        gravity: np.ndarray,
+        drag_coefficient: float,
+        residuals: np.ndarray,
+        inlier_mask: np.ndarray,
+    ):
+        self.ballistic_model = ballistic_model
+        self.launch_time = launch_time
+        self.launch_position = launch_position
+        self.launch_velocity = launch_velocity
+        self.gravity = gravity
+        self.drag_coefficient = drag_coefficient
+        self.residuals = residuals
+        self.inlier_mask = inlier_mask
+
+    def get_launch_speed(self) -> float:
+        return float(np.linalg.norm(self.launch_velocity))
+
+    def get_launch_acceleration(self) -> np.ndarray:
+        return self.gravity - self.drag_coefficient * np.linalg.norm(self.launch_velocity) * self.launch_velocity
+
+    def get_rms_residual(self) -> float:
+        inlier_residuals = self.residuals[self.inlier_mask]
+        return float(np.sqrt(np.mean(np.sum(inlier_residuals**2, axis=1))))
+
+    def get_number_of_outliers(self) -> int:
+        return int(np.count_nonzero(~self.inlier_mask))
+
+
+def fit_ballistic_models(
+    list_time_vectors: List[np.ndarray],
+    list_position_vectors: List[np.ndarray],
+    ballistic_model: AvailableBallisticModels = AvailableBallisticModels.PARABOLIC,
+    outlier_threshold: float = 3.5,
+    max_iterations: int = 10,
+    gravity: np.ndarray = None,
+) -> List[BallisticFitResult]:
+    """
+    Fits a ballistic model on many trajectories at once.
+    Each trajectory is given as a time vector of shape (N,) and a position vector of shape (N, 3). The trajectories
+    are padded to the same length so that all of them are fitted with a single batched solve.
+    A point is considered an outlier when its residual is larger than outlier_threshold robust standard deviations
+    (of the noise on each axis, estimated from the median of the 3D residuals).
+    The quadratic drag model only fits the launch position, the launch velocity and the drag coefficient. Its gravity
+    is the given gravity vector (shape (3,), in the frame of the positions) or, when None, a vector of norm
+    STANDARD_GRAVITY estimated from the parabolic fit (see _estimate_gravities).
+    """
+    assert list_time_vectors, "At least one trajectory must be given to fit a ballistic model."
+    assert len(list_time_vectors) == len(
+        list_position_vectors
+    ), "The number of time vectors and the number of position vectors differ."
+    assert max_iterations > 0, "At least one iteration is needed to fit a ballistic model."
+    assert gravity is None or np.shape(gravity) == (3,), "The gravity must be a 3D vector."
+
+    times, positions, valid_mask, launch_times = _pad_trajectories(list_time_vectors, list_position_vectors)
+
+    coefficients, inlier_mask = _fit_parabolic_models(times, positions, valid_mask, outlier_threshold, max_iterations)
+    launch_positions = coefficients[:, 0, :]
+    launch_velocities = coefficients[:, 1, :]
+    gravities = coefficients[:, 2, :]
+    drag_coefficients = np.zeros(len(list_time_vectors))
+    residuals = positions - _get_parabolic_design_matrix(times) @ coefficients
+
+    if ballistic_model == AvailableBallisticModels.QUADRATIC_DRAG:
+        if gravity is None:
+            gravities = _estimate_gravities(times, valid_mask, launch_velocities, gravities)
+        else:
+            gravities = np.tile(np.asarray(gravity, dtype=float), (len(list_time_vectors), 1))
+        launch_positions, launch_velocities, drag_coefficients = _fit_quadratic_drag_models(
+            times, positions, inlier_mask, residuals, launch_positions, launch_velocities, gravities
+        )
+        residuals = positions - _integrate_quadratic_drag_models(
+            times, launch_positions, launch_velocities, gravities, drag_coefficients
+        )
+        inlier_mask = _reject_outliers(residuals, valid_mask, outlier_threshold)
+
+    list_ballistic_fit_results = []
+    for idx, number_of_points in enumerate(np.count_nonzero(valid_mask, axis=1)):
+        ballistic_fit_result = BallisticFitResult(
+            ballistic_model=ballistic_model,
+            launch_time=launch_times[idx],
+            launch_position=launch_positions[idx],
+            launch_velocity=launch_velocities[idx],
+            gravity=gravities[idx],
+            drag_coefficient=float(drag_coefficients[idx]),
+            residuals=residuals[idx, :number_of_points],
+            inlier_mask=inlier_mask[idx, :number_of_points],
+        )
+        list_ballistic_fit_results.append(ballistic_fit_result)
+
+    return list_ballistic_fit_results
+
+
+def _pad_trajectories(list_time_vectors, list_position_vectors):
+    number_of_trajectories = len(list_time_vectors)
+    maximum_number_of_points = max(len(time_vector) for time_vector in list_time_vectors)
+
+    times = np.zeros((number_of_trajectories, maximum_number_of_points))
+    positions = np.zeros((number_of_trajectories, maximum_number_of_points, 3))
+    valid_mask = np.zeros((number_of_trajectories, maximum_number_of_points), dtype=bool)
+    launch_times = np.zeros(number_of_trajectories)
+
+    for idx, (time_vector, position_vector) in enumerate(zip(list_time_vectors, list_position_vectors)):
+        time_vector = np.asarray(time_vector, dtype=float)
+        position_vector = np.asarray(position_vector, dtype=float).reshape((-1, 3))
+        number_of_points = len(time_vector)
+        assert number_of_points == len(
+            position_vector
+        ), f"Trajectory {idx}: got {number_of_points} timestamps but {len(position_vector)} positions."
+        assert (
+            number_of_points >= MINIMAL_NUMBER_OF_POINTS_TO_FIT
+        ), f"Trajectory {idx}: at least {MINIMAL_NUMBER_OF_POINTS_TO_FIT} points are needed, got {number_of_points}."
+
+        launch_times[idx] = time_vector[0]
+        times[idx, :number_of_points] = time_vector - time_vector[0]
+        # The padding repeats the last timestamp: a null time step leaves the integrated drag model unchanged.
+        times[idx, number_of_points:] = times[idx, number_of_points - 1]
+        positions[idx, :number_of_points] = position_vector
+        valid_mask[idx, :number_of_points] = True
+
+    return times, positions, valid_mask, launch_times
+
+
+def _get_parabolic_design_matrix(times: np.ndarray) -> np.ndarray:
+    # position(t) = launch_position + launch_velocity * t + 0.5 * acceleration * t^2
+    return np.stack([np.ones_like(times), times, 0.5 * times**2], axis=-1)
+
+
+def _fit_parabolic_models(times, positions, valid_mask, outlier_threshold, max_iterations):
+    design_matrix = _get_parabolic_design_matrix(times)
+    inlier_mask = valid_mask.copy()
+
+    for _ in range(max_iterations):
+        weights = inlier_mask.astype(float)
+        # Weighted normal equations of every trajectory, solved for the 3 axes at once: (S, 3, 3) @ (S, 3, 3)
+        normal_matrices = np.einsum("sn,sni,snj->sij", weights, design_matrix, design_matrix)
+        right_hand_sides = np.einsum("sn,sni,snj->sij", weights, design_matrix, positions)
+        coefficients = np.linalg.solve(normal_matrices, right_hand_sides)
+
+        residuals = positions - design_matrix @ coefficients
+        new_inlier_mask = _reject_outliers(residuals, valid_mask, outlier_threshold)
+        if np.array_equal(new_inlier_mask, inlier_mask):
+            break
+        inlier_mask = new_inlier_mask
+
+    return coefficients, weights.astype(bool)
+
+
+def _get_robust_standard_deviations(residuals, mask):
+    residual_norms = np.where(mask, np.linalg.norm(residuals, axis=-1), np.nan)
+    robust_standard_deviations = (
+        np.nanmedian(residual_norms, axis=1, keepdims=True) / _MEDIAN_OF_3D_RESIDUAL_NORMS_IN_STANDARD_DEVIATIONS
+    )
+    return residual_norms, robust_standard_deviations
+
+
+def _reject_outliers(residuals, valid_mask, outlier_threshold):
+    residual_norms, robust_standard_deviations = _get_robust_standard_deviations(residuals, valid_mask)
+    with np.errstate(invalid="ignore"):
+        inlier_mask = valid_mask & (residual_norms <= outlier_threshold * robust_standard_deviations)
+
+    # We never reject so many points that the trajectory cannot be fitted anymore
+    not_enough_inliers = np.count_nonzero(inlier_mask, axis=1) < MINIMAL_NUMBER_OF_POINTS_TO_FIT
+    inlier_mask[not_enough_inliers] = valid_mask[not_enough_inliers]
+    return inlier_mask
+
+
+def _estimate_gravities(times, valid_mask, launch_velocities, parabolic_accelerations):
+    """
+    The drag is along the velocity: the part of the parabolic acceleration orthogonal to the mean velocity of the
+    flight is (almost) only gravity. The part along the velocity is then chosen so that the gravity has a norm of
+    STANDARD_GRAVITY, with the smallest drag (the drag can only slow the projectile down).
+    """
+    mean_times = np.sum(times * valid_mask, axis=1, keepdims=True) / np.count_nonzero(valid_mask, axis=1)[:, np.newaxis]
+    mean_velocities = launch_velocities + parabolic_accelerations * mean_times
+    directions = mean_velocities / np.linalg.norm(mean_velocities, axis=1, keepdims=True)
+
+    accelerations_along = np.sum(parabolic_accelerations * directions, axis=1, keepdims=True)
+    orthogonal_gravities = parabolic_accelerations - accelerations_along * directions
+    gravities_along = np.sqrt(
+        np.maximum(STANDARD_GRAVITY**2 - np.sum(orthogonal_gravities**2, axis=1, keepdims=True), 0.0)
+    )
+    gravities_along = np.where(-gravities_along >= accelerations_along, -gravities_along, gravities_along)
+    gravities = orthogonal_gravities + gravities_along * directions
+    # If the orthogonal part alone is already larger than STANDARD_GRAVITY, it is scaled down to it.
+    return STANDARD_GRAVITY * gravities / np.linalg.norm(gravities, axis=1, keepdims=True)
+
+
+def _fit_quadratic_drag_models(
+    times, positions, inlier_mask, parabolic_residuals, launch_positions, launch_velocities, gravities
+):
+    number_of_trajectories, number_of_points = times.shape
+    weights = inlier_mask.astype(float)[..., np.newaxis]
+
+    # The parabolic fit is the drag-free solution, which makes a good starting point.
+    initial_parameters = np.hstack([launch_positions, launch_velocities, np.zeros((number_of_trajectories, 1))])
+    lower_bounds = np.tile(
+        np.append(np.full(_NUMBER_OF_QUADRATIC_DRAG_PARAMETERS - 1, -np.inf), 0.0), number_of_trajectories
+    )
+
+    _, robust_standard_deviations = _get_robust_standard_deviations(parabolic_residuals, inlier_mask)
+    residual_scale = max(float(np.median(robust_standard_deviations)), np.finfo(float).eps)
+
+    def weighted_residuals(flat_parameters):
+        parameters = flat_parameters.reshape((number_of_trajectories, _NUMBER_OF_QUADRATIC_DRAG_PARAMETERS))
+        predicted_positions = _integrate_quadratic_drag_models(
+            times, parameters[:, 0:3], parameters[:, 3:6], gravities, parameters[:, 6]
+        )
+        return ((predicted_positions - positions) * weights).ravel()
+
+    # The residuals of a trajectory only depend on its own parameters: the jacobian is block diagonal.
+    # Telling it to the solver keeps the cost of the finite differences independent of the number of trajectories.
+    jacobian_sparsity = kron(
+        identity(number_of_trajectories, format="csr"),
+        np.ones((3 * number_of_points, _NUMBER_OF_QUADRATIC_DRAG_PARAMETERS)),
+        format="csr",
+    )
+
+    solution = least_squares(
+        weighted_residuals,
+        initial_parameters.ravel(),
+        jac_sparsity=jacobian_sparsity,
+        bounds=(lower_bounds, np.inf),
+        method="trf",
+        loss="soft_l1",
+        f_scale=residual_scale,
+        x_scale="jac",
+    )
+
+    parameters = solution.x.reshape((number_of_trajectories, _NUMBER_OF_QUADRATIC_DRAG_PARAMETERS))
+    return parameters[:, 0:3], parameters[:, 3:6], parameters[:, 6]
+
+
+def _integrate_quadratic_drag_models(times, launch_positions, launch_velocities, gravities, drag_coefficients):
+    """
+    Integrates acceleration = gravity - drag_coefficient * |v| * v for all the trajectories at once,
+    with a 4th order Runge-Kutta scheme whose steps are the timestamps of the trajectories.
+    """
+    predicted_positions = np.empty(times.shape + (3,))
+    position = np.array(launch_positions, dtype=float)
+    velocity = np.array(launch_velocities, dtype=float)
+    drag_coefficients = np.reshape(drag_coefficients, (-1, 1))
+    predicted_positions[:, 0] = position
+
+    def acceleration(current_velocity):
+        speeds = np.linalg.norm(current_velocity, axis=1, keepdims=True)
+        return gravities - drag_coefficients * speeds * current_velocity
+
+    for idx in range(times.shape[1] - 1):
+        dt = (times[:, idx + 1] - times[:, idx])[:, np.newaxis]
+
+        velocity_1 = velocity
+        acceleration_1 = acceleration(velocity_1)
+        velocity_2 = velocity + 0.5 * dt * acceleration_1
+        acceleration_2 = acceleration(velocity_2)
+        velocity_3 = velocity + 0.5 * dt * acceleration_2
+        acceleration_3 = acceleration(velocity_3)
+        velocity_4 = velocity + dt * acceleration_3
+        acceleration_4 = acceleration(velocity_4)
+
+        position = position + dt / 6 * (velocity_1 + 2 * velocity_2 + 2 * velocity_3 + velocity_4)
+        velocity = velocity + dt / 6 * (acceleration_1 + 2 * acceleration_2 + 2 * acceleration_3 + acceleration_4)
+        predicted_positions[:, idx + 1] = position
+
+    return predicted_positions
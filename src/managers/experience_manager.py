@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 import cv2
 import numpy as np
@@ -7,12 +7,22 @@ import pandas as pd
 from matplotlib import pyplot as plt
 
 from configuration_reader import Config
-from constants import AvailableProjectileFinderMethods
-from data_types.data_types import ImagePair, Point2DPair, Point3D, TimedImagePair, TimedPoint2DPair, TimedPoint3D
+from constants import (
+    MAD_TO_STANDARD_DEVIATION,
+    AvailableBallisticModels,
+    AvailableFramePreFilterMethods,
+    AvailableProjectileFinderMethods,
+    AvailableProjectileRefinementMethods,
+)
+from data_types.data_types import ImagePair, Point3D, TimedImagePair, TimedPoint2DPair, TimedPoint3D
 from image_processing.camera import CameraSetup
 from image_processing.image_processor import ImagePairProcessor
+from kinematics.ballistic_fitter import BallisticFitResult, fit_ballistic_models
 from managers.files_manager import FilesManager
+from managers.shot_segmentation import ShotKinematics, segment_shots
+from reporting.report_generator import DEFAULT_REPORTS_DIRECTORY, generate_reports, render_report
 from src.constants import ColorDomain
+from utils.utils import ImageBufferPool
 
 
 class ExperienceManager:
@@ -27,6 +37,13 @@ class ExperienceManager:
 
         self._files_manager = FilesManager()
         self._files_manager.update_from_config(config=self._configuration)
+        self._configuration_images_directories = (
+            self._configuration.left_camera_config.directory_path,
+            self._configuration.right_camera_config.directory_path,
+        )
+
+        self._image_buffer_pool = ImageBufferPool()
+        self._progress_callback: callable = None
 
         self._list_timed_pair_projectile_coordinates_2d: List[TimedPoint2DPair] = []
 
@@ -35,9 +52,33 @@ class ExperienceManager:
         self._list_timed_projectile_speed_3d: List[TimedPoint3D] = []
         self._list_timed_projectile_acceleration_3d: List[TimedPoint3D] = []
 
+        self._ballistic_fit_result: BallisticFitResult = None
+        self._sampling_rate_sweep_kinematics: Dict[int, Tuple[List[TimedPoint3D], ...]] = {}
+
+        # Only used when a recording holds several shots
+        self._shot_segmentation_parameters = {"max_missing_frames": 10, "max_time_gap": None, "min_number_of_points": 5}
+        self._list_shots_kinematics: List[ShotKinematics] = []
+
     def set_projectile_finder_method(self, projectile_finder_method: AvailableProjectileFinderMethods):
         self._image_pair_processor.set_projectile_finder_method(projectile_finder_method)
 
+    def set_projectile_refinement_method(
+        self, projectile_refinement_method: AvailableProjectileRefinementMethods, window_half_size: int
+    ):
+        # The window must contain the whole projectile (see get_refinement_window_half_size).
+        # A None method disables the refinement.
+        self._image_pair_processor.set_projectile_refinement_method(projectile_refinement_method, window_half_size)
+
+    def set_frame_prefilter_method(
+        self, frame_prefilter_method: AvailableFramePreFilterMethods, **prefilter_parameters
+    ):
+        # None disables the pre-filter. The parameters are given to the pre-filter class (e.g. difference_threshold)
+        self._image_pair_processor.set_frame_prefilter_method(frame_prefilter_method, **prefilter_parameters)
+
+    def get_frame_prefilter_statistics(self) -> dict:
+        # Image pairs seen and skipped (and the skip rate) since the pre-filter was set or the results were cleared
+        return self._image_pair_processor.get_frame_prefilter_statistics()
+
     def set_color_domain_to_find_projectile(self, new_color_domain: ColorDomain):
         self._image_pair_processor.set_color_domain_to_find_projectile(new_color_domain)
 
@@ -47,9 +88,67 @@ class ExperienceManager:
     def _assign_images(self, matching_image_pair: ImagePair):
         self._image_pair_processor.set_image_pair_to_camera_pair(matching_image_pair)
 
+    def set_images_directories(self, left_images_directory: str = None, right_images_directory: str = None):
+        # A directory that is not given is the one of the configuration file.
+        # The images are listed again, even if the directories did not change (new images may have been added).
+        self._configuration.left_camera_config.set_directory_path(
+            left_images_directory or self._configuration_images_directories[0]
+        )
+        self._configuration.right_camera_config.set_directory_path(
+            right_images_directory or self._configuration_images_directories[1]
+        )
+        self._files_manager = FilesManager()
+        self._files_manager.update_from_config(config=self._configuration)
+
+    def set_progress_callback(self, new_progress_callback: callable):
+        # The callback is called with (number_of_processed_image_pairs, number_of_image_pairs) after each image pair
+        self._progress_callback = new_progress_callback
+
+    def clear_results(self):
+        self._list_timed_pair_projectile_coordinates_2d = []
+        self._list_timed_projectile_coordinates_3d = []
+        self._list_timed_projectile_speed_3d = []
+        self._list_timed_projectile_acceleration_3d = []
+        self._ballistic_fit_result = None
+        self._sampling_rate_sweep_kinematics = {}
+        self._list_shots_kinematics = []
+        self._image_pair_processor.reset_frame_prefilter_statistics()
+
+    def get_number_of_image_pairs(self) -> int:
+        return len(self._files_manager.get_list_timed_matching_image_path_pair())
+
+    def set_list_timed_pair_projectile_coordinates_2d(self, new_list_timed_pair_coordinates_2d: List[TimedPoint2DPair]):
+        self._list_timed_pair_projectile_coordinates_2d = new_list_timed_pair_coordinates_2d
+
     def extract_projectile_2d_coordinates_in_image_pairs(self, *args, **kwargs):
-        for timed_matching_image_path_pair in self._files_manager.get_list_timed_matching_image_path_pair():
-            timed_matching_image_pair = TimedImagePair.from_timed_path_pair(timed_matching_image_path_pair)
+        list_timed_matching_image_path_pair = self._files_manager.get_list_timed_matching_image_path_pair()
+        self._list_timed_pair_projectile_coordinates_2d += self._find_projectile_in_timed_image_path_pairs(
+            list_timed_matching_image_path_pair, *args, **kwargs
+        )
+
+    def extract_projectile_2d_coordinates_in_frame_range(
+        self, start_index: int, stop_index: int, *args, **kwargs
+    ) -> List[TimedPoint2DPair]:
+        # Unlike extract_projectile_2d_coordinates_in_image_pairs, the coordinates found are returned and not stored.
+        # This is used to process a recording by shards (see the distributed package).
+        list_timed_matching_image_path_pair = self._files_manager.get_list_timed_matching_image_path_pair()
+        return self._find_projectile_in_timed_image_path_pairs(
+            list_timed_matching_image_path_pair[start_index:stop_index], *args, **kwargs
+        )
+
+    def _find_projectile_in_timed_image_path_pairs(
+        self, list_timed_matching_image_path_pair, *args, **kwargs
+    ) -> List[TimedPoint2DPair]:
+        list_timed_pair_projectile_coordinates_2d = []
+        # When the projectile is found in grayscale, the images are directly decoded in grayscale (3 times less data)
+        read_in_grayscale = self._image_pair_processor.get_color_domain_to_find_projectile() != ColorDomain.RGB
+        number_of_image_pairs = len(list_timed_matching_image_path_pair)
+        # The first image pair of the list does not follow the last one processed before
+        self._image_pair_processor.reset_frame_prefilter()
+        for idx, timed_matching_image_path_pair in enumerate(list_timed_matching_image_path_pair):
+            timed_matching_image_pair = TimedImagePair.from_timed_path_pair(
+                timed_matching_image_path_pair, in_grayscale=read_in_grayscale, buffer_pool=self._image_buffer_pool
+            )
             self._assign_images(matching_image_pair=timed_matching_image_pair.get_data())
 
             projectile_found_in_pair_of_images = self._image_pair_processor.find_projectile_in_images(*args, **kwargs)
@@ -59,21 +158,50 @@ class ExperienceManager:
                 projectile_found_in_pair_of_images.right,
             )
 
-            self._list_timed_pair_projectile_coordinates_2d.append(timed_projectile_found_in_pair_of_images)
+            list_timed_pair_projectile_coordinates_2d.append(timed_projectile_found_in_pair_of_images)
+            if self._progress_callback is not None:
+                self._progress_callback(idx + 1, number_of_image_pairs)
+
+        return list_timed_pair_projectile_coordinates_2d
+
+    def _compute_3d_coords_from_2d_coords_pairs(
+        self, list_timed_pair_coords_2d: List[TimedPoint2DPair]
+    ) -> List[TimedPoint3D]:
+        list_timed_pair_coords_2d = [
+            timed_pair_coords_2d
+            for timed_pair_coords_2d in list_timed_pair_coords_2d
+            if timed_pair_coords_2d.get_data().is_valid()
+        ]
+        if not list_timed_pair_coords_2d:
+            return []
+
+        left_points_2d = np.vstack(
+            [timed_pair_coords_2d.get_data().left.get_point() for timed_pair_coords_2d in list_timed_pair_coords_2d]
+        ).astype(np.float64)
+        right_points_2d = np.vstack(
+            [timed_pair_coords_2d.get_data().right.get_point() for timed_pair_coords_2d in list_timed_pair_coords_2d]
+        ).astype(np.float64)
 
-    def _compute_3d_coords_from_2d_coords_pair(self, pair_coords_2d: Point2DPair) -> Point3D:
-        if not _can_be_reconstructed(pair_coords_2d):
-            return Point3D()
+        # The lens distortion is only removed from the points found, all at once (and not from the whole images)
+        left_points_2d = self._camera_setup.left_camera.undistort_points(left_points_2d)
+        right_points_2d = self._camera_setup.right_camera.undistort_points(right_points_2d)
 
-        reconstructed_point3d = cv2.triangulatePoints(
+        reconstructed_points_homogeneous = cv2.triangulatePoints(
             projMatr1=self._camera_setup.left_camera.get_projection_matrix(),
             projMatr2=self._camera_setup.right_camera.get_projection_matrix(),
-            projPoints1=pair_coords_2d.left.get_point(),
-            projPoints2=pair_coords_2d.right.get_point(),
-        )
-        return Point3D(
-            float(reconstructed_point3d[0]), float(reconstructed_point3d[1]), float(reconstructed_point3d[2])
+            projPoints1=np.ascontiguousarray(left_points_2d.T),
+            projPoints2=np.ascontiguousarray(right_points_2d.T),
         )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reconstructed_points_3d = (reconstructed_points_homogeneous[:3] / reconstructed_points_homogeneous[3]).T
+
+        list_timed_points_3d = []
+        for timed_pair_coords_2d, reconstructed_point_3d in zip(list_timed_pair_coords_2d, reconstructed_points_3d):
+            # A point at infinity can not be part of the trajectory
+            if np.all(np.isfinite(reconstructed_point_3d)):
+                point_3d = Point3D(*(float(coordinate) for coordinate in reconstructed_point_3d))
+                list_timed_points_3d.append(TimedPoint3D(timed_pair_coords_2d.get_timestamp(), point_3d))
+        return list_timed_points_3d
 
     def compute_trajectory(self):
         assert self._list_timed_pair_projectile_coordinates_2d, (
@@ -81,41 +209,21 @@ class ExperienceManager:
             "If you did call extract_projectile_2d_coordinates_in_image_pairs() before, it means it did not find any target in the images provided."
         )
 
-        for projectile_coords_pair_2d in self._list_timed_pair_projectile_coordinates_2d:
-            projectile_3d_coords = self._compute_3d_coords_from_2d_coords_pair(projectile_coords_pair_2d.get_data())
-            if projectile_3d_coords.is_valid():
-                timed_point_3d = TimedPoint3D(projectile_coords_pair_2d.get_timestamp(), projectile_3d_coords)
-                self._list_timed_projectile_coordinates_3d.append(timed_point_3d)
+        self._list_timed_projectile_coordinates_3d += self._compute_3d_coords_from_2d_coords_pairs(
+            self._list_timed_pair_projectile_coordinates_2d
+        )
 
     def compute_speed(self):
         assert (
             self._list_timed_projectile_coordinates_3d
         ), "The projectile coordinates are not computed yet. You may use the compute_trajectory() function before calling compute_speed()"
-        for idx in range(len(self._list_timed_projectile_coordinates_3d) - 1):
-            current_timed_3d_point = self._list_timed_projectile_coordinates_3d[idx]
-            next_timed_3d_point = self._list_timed_projectile_coordinates_3d[idx + 1]
-
-            dt = next_timed_3d_point.timestamp - current_timed_3d_point.timestamp
-            speed = (next_timed_3d_point.get_point() - current_timed_3d_point.get_point()) / dt
-
-            timed_speed_point = TimedPoint3D(current_timed_3d_point.timestamp, Point3D(*np.squeeze(speed)))
-            self._list_timed_projectile_speed_3d.append(timed_speed_point)
+        self._list_timed_projectile_speed_3d += _compute_time_derivative(self._list_timed_projectile_coordinates_3d)
 
     def compute_acceleration(self):
         assert (
             self._list_timed_projectile_speed_3d
         ), "The speed coordinates are not computed yet. You may use the compute_speed() function before calling compute_acceleration()"
-        for idx in range(len(self._list_timed_projectile_speed_3d) - 1):
-            current_timed_3d_speed = self._list_timed_projectile_speed_3d[idx]
-            next_timed_3d_speed = self._list_timed_projectile_speed_3d[idx + 1]
-
-            dt = next_timed_3d_speed.timestamp - current_timed_3d_speed.timestamp
-            acceleration = (next_timed_3d_speed.get_point() - current_timed_3d_speed.get_point()) / dt
-
-            timed_acceleration_point = TimedPoint3D(
-                current_timed_3d_speed.timestamp, Point3D(*np.squeeze(acceleration))
-            )
-            self._list_timed_projectile_acceleration_3d.append(timed_acceleration_point)
+        self._list_timed_projectile_acceleration_3d += _compute_time_derivative(self._list_timed_projectile_speed_3d)
 
     def compute_kinematics(self, *args, **kwargs):
         self.extract_projectile_2d_coordinates_in_image_pairs(*args, **kwargs)
@@ -123,6 +231,195 @@ class ExperienceManager:
         self.compute_speed()
         self.compute_acceleration()
 
+    def set_shot_segmentation_parameters(
+        self, max_missing_frames: int = 10, max_time_gap: float = None, min_number_of_points: int = 5
+    ):
+        assert max_missing_frames >= 0, "The number of missing frames can not be negative."
+        assert min_number_of_points >= 3, "At least 3 points are needed to compute the kinematics of a shot."
+        self._shot_segmentation_parameters = {
+            "max_missing_frames": max_missing_frames,
+            "max_time_gap": max_time_gap,
+            "min_number_of_points": min_number_of_points,
+        }
+
+    def get_list_shots_kinematics(self) -> List[ShotKinematics]:
+        return self._list_shots_kinematics
+
+    def compute_kinematics_per_shot(self, *args, **kwargs) -> List[ShotKinematics]:
+        """
+        Same as compute_kinematics, for a recording holding several shots. The 2D coordinates are cut into shots
+        (see set_shot_segmentation_parameters), and the kinematics of each shot are computed independently.
+        The shots are processed sequentially, not in parallel. Unlike compute_kinematics, the speed is never computed
+        across the gap between two shots.
+        """
+        if not self._list_timed_pair_projectile_coordinates_2d:
+            self.extract_projectile_2d_coordinates_in_image_pairs(*args, **kwargs)
+
+        list_shots_kinematics = [
+            ShotKinematics(shot_index, list_timed_pair_coordinates_2d)
+            for shot_index, list_timed_pair_coordinates_2d in enumerate(
+                segment_shots(self._list_timed_pair_projectile_coordinates_2d, **self._shot_segmentation_parameters)
+            )
+        ]
+        # The shots are processed one after the other: the 3D reconstruction of each shot is already vectorized,
+        # and the rest (building the timed points) holds the GIL, so threads would not run it in parallel. Processes
+        # would have to pickle the cameras and the points of every shot, which costs more than computing them
+        for shot_kinematics in list_shots_kinematics:
+            self._compute_shot_kinematics(shot_kinematics)
+
+        self._list_shots_kinematics = list_shots_kinematics
+        return list_shots_kinematics
+
+    def _compute_shot_kinematics(self, shot_kinematics: ShotKinematics):
+        shot_kinematics.list_timed_projectile_coordinates_3d = self._compute_3d_coords_from_2d_coords_pairs(
+            shot_kinematics.list_timed_pair_projectile_coordinates_2d
+        )
+        shot_kinematics.list_timed_projectile_speed_3d = _compute_time_derivative(
+            shot_kinematics.list_timed_projectile_coordinates_3d
+        )
+        shot_kinematics.list_timed_projectile_acceleration_3d = _compute_time_derivative(
+            shot_kinematics.list_timed_projectile_speed_3d
+        )
+
+    def save_results_per_shot_as_csv(self, save_to: str = "results.csv") -> List[Path]:
+        assert (
+            self._list_shots_kinematics
+        ), "The kinematics per shot were not computed. You may run compute_kinematics_per_shot before calling this function."
+
+        # Each shot is saved in its own file: results_shot_0.csv, results_shot_1.csv...
+        file_name_root = save_to[: -len(".csv")] if save_to.endswith(".csv") else save_to
+        shots_kinematics_to_save = [
+            shot_kinematics for shot_kinematics in self._list_shots_kinematics if shot_kinematics.has_kinematics()
+        ]
+        return [
+            save_kinematics_as_csv(
+                shot_kinematics.list_timed_projectile_coordinates_3d,
+                shot_kinematics.list_timed_projectile_speed_3d,
+                shot_kinematics.list_timed_projectile_acceleration_3d,
+                f"{file_name_root}_shot_{shot_kinematics.shot_index}.csv",
+            )
+            for shot_kinematics in shots_kinematics_to_save
+        ]
+
+    def compute_kinematics_sampling_rate_sweep(
+        self, list_image_sampling_rates: List[int], *args, **kwargs
+    ) -> pd.DataFrame:
+        """
+        Computes the kinematics for several sampling rates, while finding the projectile only once in the images.
+        The projectile is found in all the image pairs currently selected (unless it was already done), then each
+        sampling rate N keeps 1 image pair every N. Returns a table comparing the noise and the time resolution of
+        the kinematics obtained with each sampling rate.
+        """
+        assert list_image_sampling_rates, "At least one sampling rate must be given."
+        assert all(
+            isinstance(image_sampling_rate, int) and image_sampling_rate > 0
+            for image_sampling_rate in list_image_sampling_rates
+        ), "The sampling rates must be integers greater than 1."
+
+        if not self._list_timed_pair_projectile_coordinates_2d:
+            self.extract_projectile_2d_coordinates_in_image_pairs(*args, **kwargs)
+
+        # The triangulation of a pair of points does not depend on the sampling rate: it is only done once
+        timed_points_3d_by_timestamp = {
+            timed_point_3d.get_timestamp(): timed_point_3d
+            for timed_point_3d in self._compute_3d_coords_from_2d_coords_pairs(
+                self._list_timed_pair_projectile_coordinates_2d
+            )
+        }
+
+        rows = []
+        for image_sampling_rate in list_image_sampling_rates:
+            list_timed_pair_coordinates_2d = self._list_timed_pair_projectile_coordinates_2d[::image_sampling_rate]
+            list_timed_positions_3d = [
+                timed_points_3d_by_timestamp[timed_pair_coordinates_2d.get_timestamp()]
+                for timed_pair_coordinates_2d in list_timed_pair_coordinates_2d
+                if timed_pair_coordinates_2d.get_timestamp() in timed_points_3d_by_timestamp
+            ]
+            list_timed_speeds_3d = _compute_time_derivative(list_timed_positions_3d)
+            list_timed_accelerations_3d = _compute_time_derivative(list_timed_speeds_3d)
+            self._sampling_rate_sweep_kinematics[image_sampling_rate] = (
+                list_timed_positions_3d,
+                list_timed_speeds_3d,
+                list_timed_accelerations_3d,
+            )
+
+            timestamps = [timed_pair_2d.get_timestamp() for timed_pair_2d in list_timed_pair_coordinates_2d]
+            time_step = np.median(np.diff(timestamps)) if len(timestamps) > 1 else np.nan
+            speed_magnitudes = _get_magnitudes(list_timed_speeds_3d)
+            acceleration_magnitudes = _get_magnitudes(list_timed_accelerations_3d)
+            rows.append(
+                {
+                    "sampling_rate": image_sampling_rate,
+                    "framerate": 1 / time_step,
+                    "time_step": time_step,
+                    "number_of_positions": len(list_timed_positions_3d),
+                    "mean_speed": np.mean(speed_magnitudes) if speed_magnitudes.size else np.nan,
+                    "speed_noise": _estimate_noise(speed_magnitudes),
+                    "mean_acceleration": np.mean(acceleration_magnitudes) if acceleration_magnitudes.size else np.nan,
+                    "acceleration_noise": _estimate_noise(acceleration_magnitudes),
+                }
+            )
+
+        return pd.DataFrame(rows)
+
+    def get_sampling_rate_sweep_kinematics(self, image_sampling_rate: int):
+        # Returns the lists of timed positions, speeds and accelerations computed for this sampling rate
+        assert (
+            image_sampling_rate in self._sampling_rate_sweep_kinematics
+        ), f"The kinematics were not computed for the sampling rate {image_sampling_rate}. You may use compute_kinematics_sampling_rate_sweep() first."
+        return self._sampling_rate_sweep_kinematics[image_sampling_rate]
+
+    def _get_trajectory_as_arrays(self):
+        assert (
+            self._list_timed_projectile_coordinates_3d
+        ), "The projectile coordinates are not computed yet. You may use the compute_trajectory() function first."
+        return _stack_timed_points(self._list_timed_projectile_coordinates_3d)
+
+    def set_ballistic_fit_result(self, new_ballistic_fit_result: BallisticFitResult):
+        self._ballistic_fit_result = new_ballistic_fit_result
+
+    def get_ballistic_fit_result(self) -> BallisticFitResult:
+        return self._ballistic_fit_result
+
+    def fit_ballistic_model(
+        self,
+        ballistic_model: AvailableBallisticModels = AvailableBallisticModels.PARABOLIC,
+        outlier_threshold: float = 3.5,
+        gravity: np.ndarray = None,
+    ) -> BallisticFitResult:
+        time_vector, positions_vectors = self._get_trajectory_as_arrays()
+        ballistic_fit_result = fit_ballistic_models(
+            [time_vector],
+            [positions_vectors],
+            ballistic_model=ballistic_model,
+            outlier_threshold=outlier_threshold,
+            gravity=gravity,
+        )[0]
+        self.set_ballistic_fit_result(ballistic_fit_result)
+        return ballistic_fit_result
+
+    def get_kinematics_as_arrays(self) -> Dict[str, np.ndarray]:
+        # The lists of timed points are stacked once, in arrays that are cheap to send to another process
+        time_vector, positions = _stack_timed_points(self._list_timed_projectile_coordinates_3d)
+        speed_time_vector, speeds = _stack_timed_points(self._list_timed_projectile_speed_3d)
+        acceleration_time_vector, accelerations = _stack_timed_points(self._list_timed_projectile_acceleration_3d)
+        return {
+            "time": time_vector,
+            "positions": positions,
+            "speed_time": speed_time_vector,
+            "speeds": speeds,
+            "acceleration_time": acceleration_time_vector,
+            "accelerations": accelerations,
+        }
+
+    def generate_report(
+        self, output_directory=DEFAULT_REPORTS_DIRECTORY / "report", max_points: int = 2000, max_arrows: int = 100
+    ) -> List[Path]:
+        assert (
+            self._list_timed_projectile_coordinates_3d
+        ), "The kinematics are not computed yet. You may use the compute_kinematics() function before calling generate_report()"
+        return render_report(self.get_kinematics_as_arrays(), output_directory, max_points, max_arrows)
+
     def plot_trajectory(self):
         list_3d_positions = np.vstack(
             [timed_point_3d.get_point() for timed_point_3d in self._list_timed_projectile_coordinates_3d]
@@ -218,59 +515,144 @@ class ExperienceManager:
             and self._list_timed_projectile_acceleration_3d
         ), "The kinematics were not (or partially not) computed. You may run compute_kinematics before calling this function."
 
-        time_vector = np.array(
-            [timed_position_3d.get_timestamp() for timed_position_3d in self._list_timed_projectile_coordinates_3d]
+        return save_kinematics_as_csv(
+            self._list_timed_projectile_coordinates_3d,
+            self._list_timed_projectile_speed_3d,
+            self._list_timed_projectile_acceleration_3d,
+            save_to,
         )
 
-        positions_vectors = np.hstack(
-            [
-                timed_positions_3d.get_point().reshape((3, 1))
-                for timed_positions_3d in self._list_timed_projectile_coordinates_3d
-            ]
-        )
-        number_positions = positions_vectors.shape[1]
 
-        speeds_vectors = np.hstack(
-            [timed_speed_3d.get_point().reshape((3, 1)) for timed_speed_3d in self._list_timed_projectile_speed_3d]
-        )
-        number_speeds = speeds_vectors.shape[1]
-        nan_speed_points = np.full(
-            (3, number_positions - number_speeds), np.nan
-        )  # In order to have the same size as the positions (the dimension is 1 less because of the discretized gradient)
-        speeds_vectors = np.hstack([speeds_vectors, nan_speed_points])
-
-        accelerations_vectors = np.hstack(
-            [
-                timed_acceleration_3d.get_point().reshape((3, 1))
-                for timed_acceleration_3d in self._list_timed_projectile_acceleration_3d
-            ]
-        )
-        number_accelerations = accelerations_vectors.shape[1]
-        nan_acceleration_points = np.full(
-            (3, number_positions - number_accelerations), np.nan
-        )  # In order to have the same size as the positions (the dimension is 2 less because of the discretized gradients)
-        accelerations_vectors = np.hstack([accelerations_vectors, nan_acceleration_points])
-
-        data = {
-            "time": time_vector,
-            "x_position": positions_vectors[0, :],
-            "y_position": positions_vectors[1, :],
-            "z_position": positions_vectors[2, :],
-            "x_speed": speeds_vectors[0, :],
-            "y_speed": speeds_vectors[1, :],
-            "z_speed": speeds_vectors[2, :],
-            "x_acceleration": accelerations_vectors[0, :],
-            "y_acceleration": accelerations_vectors[1, :],
-            "z_acceleration": accelerations_vectors[2, :],
-        }
-        df = pd.DataFrame(data)
-
-        file_name = save_to if save_to.endswith(".csv") else save_to + ".csv"
-        result_dir = Path(__file__).resolve().parent.parent.parent / "results"
-        result_dir.mkdir(parents=True, exist_ok=True)
-        file_path = result_dir / file_name
-        df.to_csv(file_path, index=False, float_format="%.12f", na_rep="NaN")
-
-
-def _can_be_reconstructed(pair_coords_2d: Point2DPair) -> bool:
-    return pair_coords_2d.left.is_valid() and pair_coords_2d.right.is_valid()
+def save_kinematics_as_csv(
+    list_timed_positions_3d: List[TimedPoint3D],
+    list_timed_speeds_3d: List[TimedPoint3D],
+    list_timed_accelerations_3d: List[TimedPoint3D],
+    save_to: str = "results.csv",
+) -> Path:
+    time_vector = np.array([timed_position_3d.get_timestamp() for timed_position_3d in list_timed_positions_3d])
+
+    positions_vectors = np.hstack(
+        [timed_positions_3d.get_point().reshape((3, 1)) for timed_positions_3d in list_timed_positions_3d]
+    )
+    number_positions = positions_vectors.shape[1]
+
+    speeds_vectors = np.hstack([timed_speed_3d.get_point().reshape((3, 1)) for timed_speed_3d in list_timed_speeds_3d])
+    number_speeds = speeds_vectors.shape[1]
+    nan_speed_points = np.full(
+        (3, number_positions - number_speeds), np.nan
+    )  # In order to have the same size as the positions (the dimension is 1 less because of the discretized gradient)
+    speeds_vectors = np.hstack([speeds_vectors, nan_speed_points])
+
+    accelerations_vectors = np.hstack(
+        [timed_acceleration_3d.get_point().reshape((3, 1)) for timed_acceleration_3d in list_timed_accelerations_3d]
+    )
+    number_accelerations = accelerations_vectors.shape[1]
+    nan_acceleration_points = np.full(
+        (3, number_positions - number_accelerations), np.nan
+    )  # In order to have the same size as the positions (the dimension is 2 less because of the discretized gradients)
+    accelerations_vectors = np.hstack([accelerations_vectors, nan_acceleration_points])
+
+    data = {
+        "time": time_vector,
+        "x_position": positions_vectors[0, :],
+        "y_position": positions_vectors[1, :],
+        "z_position": positions_vectors[2, :],
+        "x_speed": speeds_vectors[0, :],
+        "y_speed": speeds_vectors[1, :],
+        "z_speed": speeds_vectors[2, :],
+        "x_acceleration": accelerations_vectors[0, :],
+        "y_acceleration": accelerations_vectors[1, :],
+        "z_acceleration": accelerations_vectors[2, :],
+    }
+    df = pd.DataFrame(data)
+
+    file_name = save_to if save_to.endswith(".csv") else save_to + ".csv"
+    result_dir = Path(__file__).resolve().parent.parent.parent / "results"
+    result_dir.mkdir(parents=True, exist_ok=True)
+    file_path = result_dir / file_name
+    df.to_csv(file_path, index=False, float_format="%.12f", na_rep="NaN")
+    return file_path
+
+
+def fit_ballistic_model_on_experiences(
+    experience_managers: List[ExperienceManager],
+    ballistic_model: AvailableBallisticModels = AvailableBallisticModels.PARABOLIC,
+    outlier_threshold: float = 3.5,
+    gravity: np.ndarray = None,
+) -> List[BallisticFitResult]:
+    # All the trajectories are fitted in a single batched call, which is much faster than fitting them one by one.
+    list_time_vectors, list_positions_vectors = [], []
+    for experience_manager in experience_managers:
+        time_vector, positions_vectors = experience_manager._get_trajectory_as_arrays()
+        list_time_vectors.append(time_vector)
+        list_positions_vectors.append(positions_vectors)
+
+    list_ballistic_fit_results = fit_ballistic_models(
+        list_time_vectors,
+        list_positions_vectors,
+        ballistic_model=ballistic_model,
+        outlier_threshold=outlier_threshold,
+        gravity=gravity,
+    )
+    for experience_manager, ballistic_fit_result in zip(experience_managers, list_ballistic_fit_results):
+        experience_manager.set_ballistic_fit_result(ballistic_fit_result)
+
+    return list_ballistic_fit_results
+
+
+def generate_reports_of_experiences(
+    experience_managers: List[ExperienceManager],
+    list_output_directories: List = None,
+    max_points: int = 2000,
+    max_arrows: int = 100,
+    max_workers: int = None,
+) -> List[List[Path]]:
+    # The reports of all the experiences are rendered in parallel. By default, they are saved in report_0, report_1...
+    if list_output_directories is None:
+        list_output_directories = [
+            DEFAULT_REPORTS_DIRECTORY / f"report_{idx}" for idx in range(len(experience_managers))
+        ]
+    list_kinematics_arrays = [
+        experience_manager.get_kinematics_as_arrays() for experience_manager in experience_managers
+    ]
+    return generate_reports(
+        list_kinematics_arrays, list_output_directories, max_points, max_arrows, max_workers=max_workers
+    )
+
+
+def _stack_timed_points(list_timed_points_3d: List[TimedPoint3D]):
+    if not list_timed_points_3d:
+        return np.empty(0), np.empty((0, 3))
+    time_vector = np.array([timed_point_3d.get_timestamp() for timed_point_3d in list_timed_points_3d])
+    points = np.vstack([timed_point_3d.get_point() for timed_point_3d in list_timed_points_3d])
+    return time_vector, points
+
+
+def _compute_time_derivative(list_timed_points_3d: List[TimedPoint3D]) -> List[TimedPoint3D]:
+    # Classical discrete time derivative: the result has 1 element less than the input
+    list_timed_derivatives_3d = []
+    for idx in range(len(list_timed_points_3d) - 1):
+        current_timed_3d_point = list_timed_points_3d[idx]
+        next_timed_3d_point = list_timed_points_3d[idx + 1]
+
+        dt = next_timed_3d_point.timestamp - current_timed_3d_point.timestamp
+        derivative = (next_timed_3d_point.get_point() - current_timed_3d_point.get_point()) / dt
+
+        timed_derivative_point = TimedPoint3D(current_timed_3d_point.timestamp, Point3D(*np.squeeze(derivative)))
+        list_timed_derivatives_3d.append(timed_derivative_point)
+    return list_timed_derivatives_3d
+
+
+def _get_magnitudes(list_timed_points_3d: List[TimedPoint3D]) -> np.ndarray:
+    if not list_timed_points_3d:
+        return np.empty(0)
+    return np.linalg.norm(np.vstack([timed_point_3d.get_point() for timed_point_3d in list_timed_points_3d]), axis=1)
+
+
+def _estimate_noise(values: np.ndarray) -> float:
+    # The signal varies slowly from one sample to the next, so the differences of consecutive samples are mostly
+    # noise. Their robust standard deviation, divided by sqrt(2), estimates the standard deviation of the noise.
+    if values.size < 3:
+        return np.nan
+    differences = np.diff(values)
+    return float(MAD_TO_STANDARD_DEVIATION * np.median(np.abs(differences - np.median(differences))) / np.sqrt(2))
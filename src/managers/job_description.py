@@ -0,0 +1,122 @@
+import json
+from typing import Dict
+
+from constants import (
+    AvailableFramePreFilterMethods,
+    AvailableProjectileFinderMethods,
+    AvailableProjectileRefinementMethods,
+)
+from managers.experience_manager import ExperienceManager
+from src.constants import ColorDomain
+
+
+class ExperienceJobDescription:
+    """
+    Holds everything needed to build and set up an ExperienceManager in another process (or on another machine).
+    It can be converted to a dictionary of simple types, which can be sent through a job queue or a socket.
+    The finder_args and finder_kwargs are the arguments given to the projectile finder function.
+    The frame_prefilter_parameters are given to the frame pre-filter class.
+    """
+
+    def __init__(
+        self,
+        configuration_file_path: str,
+        projectile_finder_method: AvailableProjectileFinderMethods = AvailableProjectileFinderMethods.FIND_CIRCLES,
+        color_domain: ColorDomain = ColorDomain.GRAYSCALE,
+        projectile_refinement_method: AvailableProjectileRefinementMethods = None,
+        refinement_window_half_size: int = None,
+        image_sampling_rate: int = 1,
+        finder_args: list = None,
+        finder_kwargs: Dict = None,
+        left_images_directory: str = None,
+        right_images_directory: str = None,
+        frame_prefilter_method: AvailableFramePreFilterMethods = None,
+        frame_prefilter_parameters: Dict = None,
+    ):
+        self.configuration_file_path = str(configuration_file_path)
+        self.projectile_finder_method = projectile_finder_method
+        self.color_domain = color_domain
+        self.projectile_refinement_method = projectile_refinement_method
+        self.refinement_window_half_size = refinement_window_half_size
+        self.image_sampling_rate = image_sampling_rate
+        self.finder_args = list(finder_args or [])
+        self.finder_kwargs = dict(finder_kwargs or {})
+        # If not given, the directories of the configuration file are used
+        self.left_images_directory = left_images_directory
+        self.right_images_directory = right_images_directory
+        self.frame_prefilter_method = frame_prefilter_method
+        self.frame_prefilter_parameters = dict(frame_prefilter_parameters or {})
+
+    def to_dict(self) -> Dict:
+        return {
+            "configurationFilePath": self.configuration_file_path,
+            "projectileFinderMethod": self.projectile_finder_method.name,
+            "colorDomain": self.color_domain.name,
+            "projectileRefinementMethod": (
+                self.projectile_refinement_method.name if self.projectile_refinement_method else None
+            ),
+            "refinementWindowHalfSize": self.refinement_window_half_size,
+            "imageSamplingRate": self.image_sampling_rate,
+            "finderArgs": self.finder_args,
+            "finderKwargs": self.finder_kwargs,
+            "leftImagesDirectory": self.left_images_directory,
+            "rightImagesDirectory": self.right_images_directory,
+            "framePreFilterMethod": self.frame_prefilter_method.name if self.frame_prefilter_method else None,
+            "framePreFilterParameters": self.frame_prefilter_parameters,
+        }
+
+    @classmethod
+    def from_dict(cls, job_as_dict: Dict):
+        projectile_refinement_method = job_as_dict.get("projectileRefinementMethod")
+        frame_prefilter_method = job_as_dict.get("framePreFilterMethod")
+        return cls(
+            configuration_file_path=job_as_dict["configurationFilePath"],
+            projectile_finder_method=AvailableProjectileFinderMethods[
+                job_as_dict.get("projectileFinderMethod", AvailableProjectileFinderMethods.FIND_CIRCLES.name)
+            ],
+            color_domain=ColorDomain[job_as_dict.get("colorDomain", ColorDomain.GRAYSCALE.name)],
+            projectile_refinement_method=(
+                AvailableProjectileRefinementMethods[projectile_refinement_method]
+                if projectile_refinement_method
+                else None
+            ),
+            refinement_window_half_size=job_as_dict.get("refinementWindowHalfSize"),
+            image_sampling_rate=job_as_dict.get("imageSamplingRate", 1),
+            finder_args=job_as_dict.get("finderArgs"),
+            finder_kwargs=job_as_dict.get("finderKwargs"),
+            left_images_directory=job_as_dict.get("leftImagesDirectory"),
+            right_images_directory=job_as_dict.get("rightImagesDirectory"),
+            frame_prefilter_method=(
+                AvailableFramePreFilterMethods[frame_prefilter_method] if frame_prefilter_method else None
+            ),
+            frame_prefilter_parameters=job_as_dict.get("framePreFilterParameters"),
+        )
+
+    def apply_settings_to(self, experience_manager: ExperienceManager):
+        # Setting the projectile finder method creates new finders: their buffers are lost
+        experience_manager.set_projectile_finder_method(self.projectile_finder_method)
+        experience_manager.set_color_domain_to_find_projectile(self.color_domain)
+        experience_manager.set_projectile_refinement_method(
+            self.projectile_refinement_method, self.refinement_window_half_size
+        )
+        experience_manager.set_frame_prefilter_method(self.frame_prefilter_method, **self.frame_prefilter_parameters)
+
+    def apply_images_selection_to(self, experience_manager: ExperienceManager, reload_images: bool = False):
+        # reload_images must be set when the ExperienceManager was used by a previous job with other images
+        if reload_images or self.left_images_directory is not None or self.right_images_directory is not None:
+            experience_manager.set_images_directories(self.left_images_directory, self.right_images_directory)
+        if self.image_sampling_rate != 1:
+            experience_manager.set_image_sampling_rate(self.image_sampling_rate)
+
+    def get_settings_key(self) -> str:
+        # Two jobs with the same key can be run by the same ExperienceManager, only the images selection differs
+        settings_as_dict = self.to_dict()
+        for images_selection_key in ["leftImagesDirectory", "rightImagesDirectory", "imageSamplingRate"]:
+            settings_as_dict.pop(images_selection_key)
+        return json.dumps(settings_as_dict, sort_keys=True)
+
+    def create_experience_manager(self) -> ExperienceManager:
+        experience_manager = ExperienceManager(configuration_file_path=self.configuration_file_path)
+        self.apply_settings_to(experience_manager)
+        self.apply_images_selection_to(experience_manager)
+        return experience_manager
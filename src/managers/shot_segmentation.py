@@ -0,0 +1,78 @@
+from typing import List
+
+from data_types.data_types import TimedPoint2DPair, TimedPoint3D
+
+
+class ShotKinematics:
+    """
+    The kinematics of a single shot, when a recording holds several ones.
+    The shot_index is the position of the shot in the recording (starting from 0).
+    """
+
+    def __init__(self, shot_index: int, list_timed_pair_projectile_coordinates_2d: List[TimedPoint2DPair]):
+        self.shot_index = shot_index
+        self.list_timed_pair_projectile_coordinates_2d = list_timed_pair_projectile_coordinates_2d
+        self.list_timed_projectile_coordinates_3d: List[TimedPoint3D] = []
+        self.list_timed_projectile_speed_3d: List[TimedPoint3D] = []
+        self.list_timed_projectile_acceleration_3d: List[TimedPoint3D] = []
+
+    def get_start_time(self):
+        return self.list_timed_pair_projectile_coordinates_2d[0].get_timestamp()
+
+    def get_end_time(self):
+        return self.list_timed_pair_projectile_coordinates_2d[-1].get_timestamp()
+
+    def has_kinematics(self) -> bool:
+        return bool(self.list_timed_projectile_acceleration_3d)
+
+
+def segment_shots(
+    list_timed_pair_projectile_coordinates_2d: List[TimedPoint2DPair],
+    max_missing_frames: int = 10,
+    max_time_gap: float = None,
+    min_number_of_points: int = 5,
+) -> List[List[TimedPoint2DPair]]:
+    """
+    Cuts the 2D coordinates found in a recording into shots.
+    A new shot starts when the projectile was not visible by both cameras during more than max_missing_frames image
+    pairs, or (if given) during more than max_time_gap seconds.
+    The image pairs before the first visible projectile and after the last one of a shot are not part of it.
+    The shots with less than min_number_of_points visible projectiles are discarded (isolated false detections).
+    """
+    visible_indices = [
+        idx
+        for idx, timed_pair_coords_2d in enumerate(list_timed_pair_projectile_coordinates_2d)
+        if timed_pair_coords_2d.get_data().is_valid()
+    ]
+
+    groups_of_visible_indices = []
+    for idx in visible_indices:
+        is_new_shot = not groups_of_visible_indices or _is_shot_break(
+            list_timed_pair_projectile_coordinates_2d,
+            groups_of_visible_indices[-1][-1],
+            idx,
+            max_missing_frames,
+            max_time_gap,
+        )
+        if is_new_shot:
+            groups_of_visible_indices.append([idx])
+        else:
+            groups_of_visible_indices[-1].append(idx)
+
+    return [
+        list_timed_pair_projectile_coordinates_2d[group[0] : group[-1] + 1]
+        for group in groups_of_visible_indices
+        if len(group) >= min_number_of_points
+    ]
+
+
+def _is_shot_break(list_timed_pair_projectile_coordinates_2d, previous_idx, idx, max_missing_frames, max_time_gap):
+    if idx - previous_idx - 1 > max_missing_frames:
+        return True
+    if max_time_gap is None:
+        return False
+    time_gap = (
+        list_timed_pair_projectile_coordinates_2d[idx].get_timestamp()
+        - list_timed_pair_projectile_coordinates_2d[previous_idx].get_timestamp()
+    )
+    return time_gap > max_time_gap
@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from matplotlib.figure import Figure
+
+# The figures are drawn with the object-oriented API of matplotlib (and not pyplot): nothing is displayed, and
+# nothing blocks. The files are written by the Agg renderer, which is chosen from the file extension.
+
+DEFAULT_REPORTS_DIRECTORY = Path(__file__).resolve().parent.parent.parent / "results"
+
+
+def decimate_min_max(time_vector: np.ndarray, values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces a time series to at most max_points samples, keeping the minimum and the maximum of each time bucket.
+    Unlike a simple subsampling, the peaks (and so the noise level) of the series remain visible.
+    """
+    number_of_points = len(values)
+    if number_of_points <= max_points:
+        return time_vector, values
+
+    bucket_size = int(np.ceil(number_of_points / max(1, max_points // 2)))
+    number_of_buckets = int(np.ceil(number_of_points / bucket_size))
+    padding = number_of_buckets * bucket_size - number_of_points
+    bucket_offsets = np.arange(number_of_buckets) * bucket_size
+
+    padded_for_min = np.pad(values, (0, padding), constant_values=np.inf).reshape((number_of_buckets, bucket_size))
+    padded_for_max = np.pad(values, (0, padding), constant_values=-np.inf).reshape((number_of_buckets, bucket_size))
+    kept_indices = np.unique(
+        np.concatenate(
+            [np.argmin(padded_for_min, axis=1) + bucket_offsets, np.argmax(padded_for_max, axis=1) + bucket_offsets]
+        )
+    )
+    return time_vector[kept_indices], values[kept_indices]
+
+
+def get_subsampling_indices(number_of_points: int, max_points: int) -> np.ndarray:
+    # Indices of at most max_points samples, evenly spread
+    if number_of_points <= max_points:
+        return np.arange(number_of_points)
+    return np.unique(np.linspace(0, number_of_points - 1, max_points).round().astype(int))
+
+
+def render_report(
+    kinematics_arrays: Dict[str, np.ndarray],
+    output_directory,
+    max_points: int = 2000,
+    max_arrows: int = 100,
+    image_format: str = "png",
+) -> List[Path]:
+    """
+    Renders all the plots of an experience (trajectory, speed vectors, speed and acceleration magnitudes) in files.
+    kinematics_arrays is the dictionary given by ExperienceManager.get_kinematics_as_arrays().
+    The trajectory is subsampled to max_points points and max_arrows speed vectors, the magnitudes are decimated to
+    max_points samples (minimum and maximum per time bucket).
+    """
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    positions = kinematics_arrays["positions"]
+    speeds = kinematics_arrays["speeds"]
+    accelerations = kinematics_arrays["accelerations"]
+
+    rendered_files = [
+        _render_trajectory(positions, max_points, output_directory / f"trajectory.{image_format}"),
+    ]
+    if len(speeds):
+        rendered_files.append(
+            _render_speed_vectors(
+                positions, speeds, max_points, max_arrows, output_directory / f"speed_vectors.{image_format}"
+            )
+        )
+        rendered_files.append(
+            _render_magnitude(
+                kinematics_arrays["speed_time"],
+                np.linalg.norm(speeds, axis=1),
+                max_points,
+                "Speed magnitude over time",
+                "Speed (m/s)",
+                output_directory / f"speed_magnitude.{image_format}",
+            )
+        )
+    if len(accelerations):
+        rendered_files.append(
+            _render_magnitude(
+                kinematics_arrays["acceleration_time"],
+                np.linalg.norm(accelerations, axis=1),
+                max_points,
+                "Acceleration magnitude over time",
+                "Acceleration (m/s^2)",
+                output_directory / f"acceleration_magnitude.{image_format}",
+            )
+        )
+    return rendered_files
+
+
+def generate_reports(
+    list_kinematics_arrays: List[Dict[str, np.ndarray]],
+    list_output_directories: List,
+    max_points: int = 2000,
+    max_arrows: int = 100,
+    image_format: str = "png",
+    max_workers: int = None,
+) -> List[List[Path]]:
+    # The reports are rendered in parallel, one process per experience (matplotlib does not benefit from threads)
+    assert len(list_kinematics_arrays) == len(
+        list_output_directories
+    ), "Each experience must be given its own output directory."
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(render_report, kinematics_arrays, output_directory, max_points, max_arrows, image_format)
+            for kinematics_arrays, output_directory in zip(list_kinematics_arrays, list_output_directories)
+        ]
+        return [future.result() for future in futures]
+
+
+def _render_trajectory(positions: np.ndarray, max_points: int, file_path: Path) -> Path:
+    kept_positions = positions[get_subsampling_indices(len(positions), max_points)]
+
+    fig = Figure()
+    ax = fig.add_subplot(111, projection="3d")
+    ax.scatter(kept_positions[:, 0], kept_positions[:, 1], kept_positions[:, 2], label="Trajectory", color="b", s=10)
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    ax.set_zlabel("Z")
+    ax.set_title("Trajectory over time")
+    ax.legend()
+    fig.savefig(file_path)
+    return file_path
+
+
+def _render_speed_vectors(
+    positions: np.ndarray, speeds: np.ndarray, max_points: int, max_arrows: int, file_path: Path
+) -> Path:
+    kept_positions = positions[get_subsampling_indices(len(positions), max_points)]
+    # The speed i is computed between the positions i and i+1, it is drawn from the position i
+    arrow_indices = get_subsampling_indices(len(speeds), max_arrows)
+    arrow_positions = positions[arrow_indices]
+    arrow_speeds = speeds[arrow_indices]
+
+    fig = Figure()
+    ax = fig.add_subplot(111, projection="3d")
+    ax.scatter(kept_positions[:, 0], kept_positions[:, 1], kept_positions[:, 2], label="Trajectory", color="b", s=10)
+    ax.quiver(
+        arrow_positions[:, 0],
+        arrow_positions[:, 1],
+        arrow_positions[:, 2],
+        arrow_speeds[:, 0],
+        arrow_speeds[:, 1],
+        arrow_speeds[:, 2],
+        color="r",
+        length=0.1,
+    )
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    ax.set_zlabel("Z")
+    ax.set_title("Speed vectors over time")
+    ax.legend()
+    fig.savefig(file_path)
+    return file_path
+
+
+def _render_magnitude(
+    time_vector: np.ndarray, magnitudes: np.ndarray, max_points: int, title: str, y_label: str, file_path: Path
+) -> Path:
+    decimated_time_vector, decimated_magnitudes = decimate_min_max(time_vector, magnitudes, max_points)
+
+    fig = Figure()
+    ax = fig.add_subplot(111)
+    ax.plot(decimated_time_vector, decimated_magnitudes)
+    ax.set_title(title)
+    ax.set_ylabel(y_label)
+    ax.set_xlabel("Time (s)")
+    fig.savefig(file_path)
+    return file_path
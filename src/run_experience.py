@@ -1,5 +1,19 @@
+import asyncio
+import json
+
 from constants import AvailableProjectileFinderMethods
+from distributed.job_queue import (
+    MemoryShardQueue,
+    ShardQueueServer,
+    create_shard_queue,
+    get_shard_queue_authkey,
+    parse_socket_address,
+)
+from distributed.shard_coordinator import ShardCoordinator
+from distributed.shard_worker import ShardWorker
 from managers.experience_manager import ExperienceManager
+from managers.job_description import ExperienceJobDescription
+from service.analysis_daemon import AnalysisDaemon, submit_job_to_daemon
 from src.constants import ColorDomain
 
 
@@ -7,7 +21,7 @@ def run_experience(config: str):
     experience_manager = ExperienceManager(configuration_file_path=config)
 
     # These values can be modified in the event someone works on the repository.
-    # As of today (March 2025), the only available method is "FIND_CIRCLES".
+    # The available methods are "FIND_CIRCLES" and "FIND_COLOR_BLOB" (for painted projectiles, works on RGB images).
     # To add a new method, please refer to the "src/projectile_finder.py" file.
     experience_manager.set_projectile_finder_method(AvailableProjectileFinderMethods.FIND_CIRCLES)
 
@@ -17,3 +31,52 @@ def run_experience(config: str):
 
     experience_manager.compute_kinematics()
     experience_manager.save_results_as_csv()
+
+
+def _get_default_job_description(config: str, left_images_directory=None, right_images_directory=None):
+    # Same settings as run_experience
+    return ExperienceJobDescription(
+        configuration_file_path=config,
+        projectile_finder_method=AvailableProjectileFinderMethods.FIND_CIRCLES,
+        color_domain=ColorDomain.GRAYSCALE,
+        left_images_directory=left_images_directory,
+        right_images_directory=right_images_directory,
+    )
+
+
+def run_distributed_experience(config: str, queue_specification: str, shard_size: int = 500, authkey: str = None):
+    # The projectile is found by the workers connected to the queue
+    job_description = _get_default_job_description(config)
+    shard_coordinator = ShardCoordinator(
+        create_shard_queue(queue_specification, authkey=authkey), job_description, shard_size
+    )
+
+    experience_manager = shard_coordinator.compute_kinematics()
+    experience_manager.save_results_as_csv()
+
+
+def run_shard_worker(queue_specification: str, shard_timeout: float = None, authkey: str = None):
+    ShardWorker(create_shard_queue(queue_specification, shard_timeout=shard_timeout, authkey=authkey)).run()
+
+
+def run_shard_queue_server(address_specification: str, shard_timeout: float = None, authkey: str = None):
+    # The server refuses to start without an authentication key
+    shard_queue_server = ShardQueueServer(
+        MemoryShardQueue(shard_timeout=shard_timeout),
+        get_shard_queue_authkey(authkey),
+        address=parse_socket_address(address_specification),
+    )
+    shard_queue_server.serve_forever()
+
+
+def run_analysis_daemon(port: int, max_concurrent_jobs: int = None):
+    AnalysisDaemon(port=port, max_concurrent_jobs=max_concurrent_jobs).run()
+
+
+def submit_experience_to_daemon(
+    config: str, port: int, left_images_directory: str = None, right_images_directory: str = None
+):
+    job_description = _get_default_job_description(config, left_images_directory, right_images_directory)
+    request = {"job": job_description.to_dict()}
+    # The events sent by the daemon (progress, result...) are simply displayed
+    asyncio.run(submit_job_to_daemon(request, port=port, event_callback=lambda event: print(json.dumps(event))))
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from constants import AvailableBallisticModels
+from managers.experience_manager import ExperienceManager
+from managers.job_description import ExperienceJobDescription
+
+DEFAULT_DAEMON_PORT = 8765
+DEFAULT_MAX_IDLE_EXPERIENCE_MANAGERS = 8
+
+
+class AnalysisDaemon:
+    """
+    Resident service analysing experiences, which avoids paying the start-up cost of a new process for every shot
+    (imports, configuration validation, camera setup...).
+    It listens on a local TCP port, and talks with JSON messages, one per line:
+    - {"command": "submit", "jobId": ..., "job": {...}, "saveTo": ..., "ballisticModel": ...}
+      "job" is the dictionary of an ExperienceJobDescription, "saveTo" (optional) the name of the CSV file of the
+      results (a file name only, it is always written in the results directory) and "ballisticModel" (optional)
+      the name of an AvailableBallisticModels to fit on the trajectory.
+      The daemon answers with an "accepted" event, "progress" events, and finally a "result" or an "error" event.
+    - {"command": "status"}: the daemon answers with the number of running and waiting jobs.
+    - {"command": "shutdown"}: the daemon stops once the submitted jobs are done.
+    At most max_concurrent_jobs jobs run at the same time, the others wait for a free slot.
+    The ExperienceManagers (and so their projectile finders and buffers) are kept warm between the jobs: a job reuses
+    an idle ExperienceManager built for the same configuration file and the same settings.
+    At most max_idle_experience_managers are kept: the least recently used ones are dropped first, and the ones built
+    from an older version of a configuration file are dropped as soon as the new version is used.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = DEFAULT_DAEMON_PORT,
+        max_concurrent_jobs: int = None,
+        progress_step: float = 0.01,
+        max_idle_experience_managers: int = DEFAULT_MAX_IDLE_EXPERIENCE_MANAGERS,
+    ):
+        self._host = host
+        self._port = port
+        self._max_concurrent_jobs = max_concurrent_jobs or os.cpu_count() or 1
+        # A progress event is sent every time progress_step (as a fraction of the image pairs) is processed
+        self._progress_step = progress_step
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrent_jobs)
+        # Ordered from the least to the most recently used key. Only accessed from the event loop
+        self._idle_experience_managers: "OrderedDict[Tuple[str, float, str], List[ExperienceManager]]" = OrderedDict()
+        self._max_idle_experience_managers = max_idle_experience_managers
+        self._job_slots: asyncio.Semaphore = None
+        self._job_tasks = set()
+        self._number_of_waiting_jobs = 0
+        self._number_of_running_jobs = 0
+        self._number_of_submitted_jobs = 0
+        self._server: asyncio.AbstractServer = None
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self._job_slots = asyncio.Semaphore(self._max_concurrent_jobs)
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port)
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            # The server was closed by a shutdown command
+            pass
+        finally:
+            if self._job_tasks:
+                await asyncio.gather(*self._job_tasks, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_job_tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    # Invalid JSON, or bytes that are not UTF-8 text
+                    request = None
+                if not isinstance(request, dict):
+                    _send(writer, {"event": "error", "message": "The request is not a JSON object."})
+                    await writer.drain()
+                    continue
+
+                command = request.get("command")
+                if command == "submit":
+                    job_task = asyncio.create_task(self._run_job(request, writer))
+                    for tasks in [client_job_tasks, self._job_tasks]:
+                        tasks.add(job_task)
+                        job_task.add_done_callback(tasks.discard)
+                elif command == "status":
+                    _send(writer, self._get_status())
+                elif command == "shutdown":
+                    _send(writer, {"event": "shutdown"})
+                    self._server.close()
+                    break
+                else:
+                    _send(writer, {"event": "error", "message": f"Unknown command '{command}'."})
+                await writer.drain()
+
+            # The client may stop writing right after its submissions: it still gets their results
+            if client_job_tasks:
+                await asyncio.gather(*client_job_tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _get_status(self) -> Dict:
+        return {
+            "event": "status",
+            "runningJobs": self._number_of_running_jobs,
+            "waitingJobs": self._number_of_waiting_jobs,
+            "maxConcurrentJobs": self._max_concurrent_jobs,
+        }
+
+    async def _run_job(self, request: Dict, writer: asyncio.StreamWriter):
+        self._number_of_submitted_jobs += 1
+        job_id = request.get("jobId", self._number_of_submitted_jobs)
+        try:
+            job_description = ExperienceJobDescription.from_dict(request["job"])
+            ballistic_model = request.get("ballisticModel")
+            ballistic_model = AvailableBallisticModels[ballistic_model] if ballistic_model else None
+            results_file_name = _get_results_file_name(request.get("saveTo", f"results_{job_id}.csv"))
+        except (KeyError, TypeError, ValueError) as error:
+            _send(writer, {"event": "error", "jobId": job_id, "message": f"Invalid job: {error!r}"})
+            return
+
+        _send(writer, {"event": "accepted", "jobId": job_id})
+        loop = asyncio.get_running_loop()
+
+        def progress_callback(number_of_processed_image_pairs, number_of_image_pairs):
+            step = max(1, int(number_of_image_pairs * self._progress_step))
+            if number_of_processed_image_pairs % step == 0 or number_of_processed_image_pairs == number_of_image_pairs:
+                progress = {
+                    "event": "progress",
+                    "jobId": job_id,
+                    "processedImagePairs": number_of_processed_image_pairs,
+                    "numberOfImagePairs": number_of_image_pairs,
+                }
+                loop.call_soon_threadsafe(_send, writer, progress)
+
+        self._number_of_waiting_jobs += 1
+        async with self._job_slots:
+            self._number_of_waiting_jobs -= 1
+            self._number_of_running_jobs += 1
+            try:
+                pool_key = _get_pool_key(job_description)
+                experience_manager = self._take_idle_experience_manager(pool_key)
+
+                experience_manager, result = await loop.run_in_executor(
+                    self._executor,
+                    _process_job,
+                    experience_manager,
+                    job_description,
+                    results_file_name,
+                    ballistic_model,
+                    progress_callback,
+                )
+                # A job that failed leaves its ExperienceManager in an unknown state: it is not reused
+                self._release_experience_manager(pool_key, experience_manager)
+                _send(writer, {"event": "result", "jobId": job_id, **result})
+            except Exception as error:
+                _send(writer, {"event": "error", "jobId": job_id, "message": f"{type(error).__name__}: {error}"})
+            finally:
+                self._number_of_running_jobs -= 1
+
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def _take_idle_experience_manager(self, pool_key: Tuple[str, float, str]) -> ExperienceManager:
+        # The ExperienceManagers built from another version of the same configuration file will never be used again
+        configuration_file_path, configuration_modification_time, _ = pool_key
+        for stale_pool_key in [
+            key
+            for key in self._idle_experience_managers
+            if key[0] == configuration_file_path and key[1] != configuration_modification_time
+        ]:
+            del self._idle_experience_managers[stale_pool_key]
+
+        idle_experience_managers = self._idle_experience_managers.get(pool_key)
+        if not idle_experience_managers:
+            return None
+        experience_manager = idle_experience_managers.pop()
+        if not idle_experience_managers:
+            del self._idle_experience_managers[pool_key]
+        return experience_manager
+
+    def _release_experience_manager(self, pool_key: Tuple[str, float, str], experience_manager: ExperienceManager):
+        self._idle_experience_managers.setdefault(pool_key, []).append(experience_manager)
+        self._idle_experience_managers.move_to_end(pool_key)
+
+        number_of_idle_experience_managers = sum(map(len, self._idle_experience_managers.values()))
+        while number_of_idle_experience_managers > self._max_idle_experience_managers:
+            least_recently_used_key, idle_experience_managers = next(iter(self._idle_experience_managers.items()))
+            idle_experience_managers.pop(0)
+            if not idle_experience_managers:
+                del self._idle_experience_managers[least_recently_used_key]
+            number_of_idle_experience_managers -= 1
+
+
+def _get_pool_key(job_description: ExperienceJobDescription) -> Tuple[str, float, str]:
+    # The configuration file may be modified while the daemon runs: its modification time is part of the key
+    configuration_file_path = os.path.abspath(job_description.configuration_file_path)
+    configuration_modification_time = os.path.getmtime(configuration_file_path)
+    return configuration_file_path, configuration_modification_time, job_description.get_settings_key()
+
+
+def _get_results_file_name(results_file_name) -> str:
+    # The name comes from the client: it must not be able to write outside of the results directory
+    results_file_name = str(results_file_name)
+    if (
+        not results_file_name
+        or results_file_name in (".", "..")
+        or os.path.basename(results_file_name) != results_file_name
+        or "\\" in results_file_name
+    ):
+        raise ValueError(f"'{results_file_name}' is not a valid results file name (no directories are allowed).")
+    return results_file_name
+
+
+def _process_job(
+    experience_manager: ExperienceManager,
+    job_description: ExperienceJobDescription,
+    save_to: str,
+    ballistic_model: AvailableBallisticModels,
+    progress_callback: callable,
+):
+    # This function runs in the thread pool of the daemon
+    if experience_manager is None:
+        experience_manager = job_description.create_experience_manager()
+    else:
+        experience_manager.clear_results()
+        job_description.apply_images_selection_to(experience_manager, reload_images=True)
+
+    experience_manager.set_progress_callback(progress_callback)
+    try:
+        experience_manager.compute_kinematics(*job_description.finder_args, **job_description.finder_kwargs)
+    finally:
+        experience_manager.set_progress_callback(None)
+
+    result = {
+        "numberOfImagePairs": experience_manager.get_number_of_image_pairs(),
+        "resultsFile": str(experience_manager.save_results_as_csv(save_to)),
+        "framePreFilterStatistics": experience_manager.get_frame_prefilter_statistics(),
+    }
+    if ballistic_model is not None:
+        ballistic_fit_result = experience_manager.fit_ballistic_model(ballistic_model)
+        result["launchSpeed"] = ballistic_fit_result.get_launch_speed()
+        result["launchVelocity"] = ballistic_fit_result.launch_velocity.tolist()
+        result["launchAcceleration"] = ballistic_fit_result.get_launch_acceleration().tolist()
+        result["dragCoefficient"] = ballistic_fit_result.drag_coefficient
+        result["rmsResidual"] = ballistic_fit_result.get_rms_residual()
+
+    return experience_manager, result
+
+
+def _send(writer: asyncio.StreamWriter, message: Dict):
+    if not writer.is_closing():
+        writer.write((json.dumps(message) + "\n").encode())
+
+
+async def submit_job_to_daemon(
+    request: Dict, host: str = "localhost", port: int = DEFAULT_DAEMON_PORT, event_callback: callable = None
+) -> Dict:
+    """
+    Submits a job to a running AnalysisDaemon and waits for its result.
+    request is the "submit" message (without the command). Every event received is given to event_callback.
+    The last event ("result" or "error") is returned.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _send(writer, {"command": "submit", **request})
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            assert line, "The daemon closed the connection before sending the result of the job."
+            event = json.loads(line)
+            if event_callback is not None:
+                event_callback(event)
+            if event["event"] in ["result", "error"]:
+                return event
+    finally:
+        writer.close()
+        await writer.wait_closed()
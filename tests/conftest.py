@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The code is run with both the repository root and the src directory in the PYTHONPATH (see the README)
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+for path in [REPOSITORY_ROOT, REPOSITORY_ROOT / "src"]:
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import pytest
+
+from service.analysis_daemon import AnalysisDaemon
+
+
+async def _send_requests_to_daemon(lines):
+    analysis_daemon = AnalysisDaemon(port=0, max_concurrent_jobs=1)
+    serve_task = asyncio.create_task(analysis_daemon.serve())
+    while analysis_daemon._server is None:
+        await asyncio.sleep(0.01)
+    port = analysis_daemon._server.sockets[0].getsockname()[1]
+
+    reader, writer = await asyncio.open_connection("localhost", port)
+    responses = []
+    for line in lines:
+        writer.write(line + b"\n")
+        responses.append(json.loads(await asyncio.wait_for(reader.readline(), timeout=5)))
+    writer.write(b'{"command": "shutdown"}\n')
+    await asyncio.wait_for(serve_task, timeout=5)
+    writer.close()
+    return responses
+
+
+@pytest.mark.parametrize("invalid_request", [b"[1, 2]", b"42", b'"status"', b"null", b"{not json", b"\xff\xfe"])
+def test_invalid_request_gets_an_error_and_keeps_the_connection(invalid_request):
+    error_response, status_response = asyncio.run(_send_requests_to_daemon([invalid_request, b'{"command": "status"}']))
+
+    assert error_response["event"] == "error"
+    assert status_response["event"] == "status"
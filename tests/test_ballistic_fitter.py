@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from constants import AvailableBallisticModels
+from kinematics.ballistic_fitter import _integrate_quadratic_drag_models, fit_ballistic_models
+
+GRAVITY = np.array([0.0, 0.0, -9.81])
+NOISE_STANDARD_DEVIATION = 0.001
+
+
+def _get_parabolic_trajectory(number_of_points=200, time_step=0.001):
+    time_vector = np.arange(number_of_points) * time_step
+    launch_position = np.array([0.0, 0.0, 1.0])
+    launch_velocity = np.array([30.0, 2.0, 10.0])
+    positions = launch_position + np.outer(time_vector, launch_velocity) + 0.5 * np.outer(time_vector**2, GRAVITY)
+    return time_vector, positions
+
+
+@pytest.mark.parametrize("outlier_size_in_standard_deviations", [6, 10])
+def test_outliers_are_rejected_in_standard_deviations_of_the_noise(outlier_size_in_standard_deviations):
+    random_generator = np.random.default_rng(0)
+    time_vector, positions = _get_parabolic_trajectory()
+    positions = positions + random_generator.normal(0, NOISE_STANDARD_DEVIATION, positions.shape)
+    outlier_indices = np.arange(10, 200, 19)
+    outlier_directions = random_generator.normal(size=(len(outlier_indices), 3))
+    outlier_directions /= np.linalg.norm(outlier_directions, axis=1, keepdims=True)
+    # The outliers are at outlier_size_in_standard_deviations standard deviations from the trajectory
+    positions[outlier_indices] += outlier_size_in_standard_deviations * NOISE_STANDARD_DEVIATION * outlier_directions
+
+    (ballistic_fit_result,) = fit_ballistic_models([time_vector], [positions], outlier_threshold=3.5)
+
+    assert set(np.flatnonzero(~ballistic_fit_result.inlier_mask)) >= set(outlier_indices)
+    # A gaussian noise is (almost) never beyond 3.5 standard deviations
+    assert ballistic_fit_result.get_number_of_outliers() <= len(outlier_indices) + 3
+
+
+def _get_quadratic_drag_trajectory(drag_coefficient, number_of_points=200, time_step=0.001):
+    time_vector = np.arange(number_of_points) * time_step
+    # The ground truth is integrated with a 10 times finer step than the one of the fit
+    fine_time_vector = np.arange(10 * (number_of_points - 1) + 1) * time_step / 10
+    positions = _integrate_quadratic_drag_models(
+        fine_time_vector[np.newaxis],
+        np.array([[0.0, 0.0, 1.0]]),
+        np.array([[30.0, 2.0, 10.0]]),
+        GRAVITY[np.newaxis],
+        np.array([drag_coefficient]),
+    )[0, ::10]
+    return time_vector, positions
+
+
+@pytest.mark.parametrize("gravity, relative_tolerance", [(GRAVITY, 0.05), (None, 0.25)])
+def test_drag_coefficient_is_recovered(gravity, relative_tolerance):
+    drag_coefficient = 0.002
+    time_vector, positions = _get_quadratic_drag_trajectory(drag_coefficient)
+    positions = positions + np.random.default_rng(0).normal(0, NOISE_STANDARD_DEVIATION, positions.shape)
+
+    (ballistic_fit_result,) = fit_ballistic_models(
+        [time_vector], [positions], ballistic_model=AvailableBallisticModels.QUADRATIC_DRAG, gravity=gravity
+    )
+
+    assert ballistic_fit_result.drag_coefficient == pytest.approx(drag_coefficient, rel=relative_tolerance)
+    assert np.linalg.norm(ballistic_fit_result.gravity) == pytest.approx(9.81)
+    assert ballistic_fit_result.launch_velocity == pytest.approx([30.0, 2.0, 10.0], abs=0.05)
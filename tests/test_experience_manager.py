@@ -0,0 +1,100 @@
+import json
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from constants import AvailableProjectileFinderMethods
+from managers.experience_manager import ExperienceManager
+from src.constants import ColorDomain
+
+IMAGE_WIDTH, IMAGE_HEIGHT = 640, 480
+FRAMERATE = 100
+NUMBER_OF_FRAMES = 20
+PROJECTILE_RADIUS_IN_PIXELS = 15
+
+
+def _get_camera_config(position, images_folder_path):
+    # Both cameras look along the z axis (no rotation)
+    return {
+        "focalX": 800,
+        "focalY": 800,
+        "skew": 0,
+        "principalPointX": IMAGE_WIDTH / 2,
+        "principalPointY": IMAGE_HEIGHT / 2,
+        "position": position,
+        "alpha": 0,
+        "beta": 0,
+        "gamma": 0,
+        "imagesFolderPath": str(images_folder_path),
+        "framerate": FRAMERATE,
+    }
+
+
+def _get_true_trajectory():
+    time_vector = np.arange(NUMBER_OF_FRAMES) / FRAMERATE
+    return np.column_stack(
+        [-0.5 + 5 * time_vector, -0.3 + 2 * time_vector + 0.5 * 9.81 * time_vector**2, np.full_like(time_vector, 5)]
+    )
+
+
+@pytest.fixture
+def synthetic_recording(tmp_path):
+    return write_synthetic_recording(tmp_path)
+
+
+def write_synthetic_recording(tmp_path):
+    """
+    Writes a configuration file and the images of a projectile (a bright disk) seen by two cameras.
+    Returns the path to the configuration file and the true 3D positions of the projectile.
+    """
+    configuration = {}
+    for camera_key, position in [("leftCamera", [-0.5, 0, 0]), ("rightCamera", [0.5, 0, 0])]:
+        images_folder_path = tmp_path / camera_key
+        images_folder_path.mkdir()
+        configuration[camera_key] = _get_camera_config(position, images_folder_path)
+    configuration_file_path = tmp_path / "configuration.json"
+    configuration_file_path.write_text(json.dumps(configuration))
+
+    true_trajectory = _get_true_trajectory()
+    camera_setup = ExperienceManager(configuration_file_path)._camera_setup
+    for camera_key, camera in [("leftCamera", camera_setup.left_camera), ("rightCamera", camera_setup.right_camera)]:
+        projected_points = camera.get_projection_matrix() @ np.vstack([true_trajectory.T, np.ones(NUMBER_OF_FRAMES)])
+        projected_points = (projected_points[:2] / projected_points[2]).T
+        for idx, (x, y) in enumerate(projected_points):
+            image = np.full((IMAGE_HEIGHT, IMAGE_WIDTH), 20, dtype=np.uint8)
+            cv.circle(image, (int(round(x)), int(round(y))), PROJECTILE_RADIUS_IN_PIXELS, 230, thickness=-1)
+            cv.imwrite(str(tmp_path / camera_key / f"image_{idx:04d}.png"), image)
+
+    return configuration_file_path, true_trajectory
+
+
+def test_compute_kinematics_end_to_end(synthetic_recording):
+    configuration_file_path, true_trajectory = synthetic_recording
+    experience_manager = ExperienceManager(configuration_file_path)
+    experience_manager.set_projectile_finder_method(AvailableProjectileFinderMethods.FIND_CIRCLES)
+    experience_manager.set_color_domain_to_find_projectile(ColorDomain.GRAYSCALE)
+
+    experience_manager.compute_kinematics()
+
+    kinematics = experience_manager.get_kinematics_as_arrays()
+    # The Hough transform may miss the projectile in a few images
+    number_of_positions = len(kinematics["positions"])
+    assert number_of_positions >= 0.8 * NUMBER_OF_FRAMES
+    assert len(kinematics["speeds"]) == number_of_positions - 1
+    assert len(kinematics["accelerations"]) == number_of_positions - 2
+    # A pixel of error on the detection is about 6 mm at 5 m
+    frame_indices = np.round(kinematics["time"] * FRAMERATE).astype(int)
+    np.testing.assert_allclose(kinematics["positions"], true_trajectory[frame_indices], atol=0.02)
+
+
+def test_compute_kinematics_per_shot_end_to_end(synthetic_recording):
+    configuration_file_path, _ = synthetic_recording
+    experience_manager = ExperienceManager(configuration_file_path)
+    experience_manager.set_projectile_finder_method(AvailableProjectileFinderMethods.FIND_CIRCLES)
+
+    list_shots_kinematics = experience_manager.compute_kinematics_per_shot()
+
+    assert len(list_shots_kinematics) == 1
+    assert list_shots_kinematics[0].has_kinematics()
+    assert len(list_shots_kinematics[0].list_timed_projectile_coordinates_3d) >= 0.8 * NUMBER_OF_FRAMES
@@ -0,0 +1,40 @@
+import socket
+import time
+
+from distributed.job_queue import MemoryShardQueue, ShardQueueServer, SocketShardQueue
+
+AUTHKEY = b"test-authkey"
+
+
+def test_silent_client_does_not_block_the_server():
+    shard_queue_server = ShardQueueServer(
+        MemoryShardQueue(), AUTHKEY, address=("localhost", 0), authentication_timeout=30
+    )
+    shard_queue_server.start_in_background()
+    try:
+        # This client connects but never answers the authentication challenge
+        with socket.create_connection(shard_queue_server.get_address()):
+            start_time = time.monotonic()
+            shard_queue = SocketShardQueue(AUTHKEY, shard_queue_server.get_address())
+            job_id = shard_queue.set_job({"name": "test"})
+            assert shard_queue.get_job() == (job_id, {"name": "test"})
+            shard_queue.close()
+            assert time.monotonic() - start_time < 5
+    finally:
+        shard_queue_server.close()
+
+
+def test_silent_client_is_disconnected_after_the_authentication_timeout():
+    shard_queue_server = ShardQueueServer(
+        MemoryShardQueue(), AUTHKEY, address=("localhost", 0), authentication_timeout=0.2
+    )
+    shard_queue_server.start_in_background()
+    try:
+        with socket.create_connection(shard_queue_server.get_address(), timeout=5) as silent_socket:
+            # The challenge is received, then the connection is closed by the server
+            received_bytes = b""
+            while chunk := silent_socket.recv(1024):
+                received_bytes += chunk
+            assert received_bytes
+    finally:
+        shard_queue_server.close()
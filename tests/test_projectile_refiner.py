@@ -0,0 +1,19 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from data_types.data_types import Point2D
+from image_processing.projectile_refiner import refine_with_edge_circle_fit, refine_with_intensity_centroid
+
+
+@pytest.mark.parametrize("refinement_function", [refine_with_intensity_centroid, refine_with_edge_circle_fit])
+def test_color_image_is_refined_like_its_grayscale_conversion(refinement_function):
+    image_bgr = np.full((480, 640, 3), 20, dtype=np.uint8)
+    cv.circle(image_bgr, (300, 200), 15, (200, 230, 250), -1)
+    coarse_detection = Point2D(298.2, 201.7)
+
+    refined_in_color = refinement_function(image_bgr, coarse_detection, 25)
+    refined_in_grayscale = refinement_function(cv.cvtColor(image_bgr, cv.COLOR_BGR2GRAY), coarse_detection, 25)
+
+    assert (refined_in_color.x, refined_in_color.y) == pytest.approx((refined_in_grayscale.x, refined_in_grayscale.y))
+    assert (refined_in_color.x, refined_in_color.y) == pytest.approx((300, 200), abs=0.5)
@@ -5,5 +5,49 @@ import cv2 as cv
 import numpy as np
 
 
-def read_image(image_path: Union[str, Path], in_grayscale: bool = False) -> np.ndarray:
-    return cv.imread(image_path, cv.IMREAD_GRAYSCALE if in_grayscale else cv.IMREAD_COLOR)
+class ImageBufferPool:
+    """
+    Recycles the buffers in which the image files are read before being decoded.
+    Since all the images of a recording have roughly the same size, the buffers stop growing after a few images and
+    reading a new image does not allocate any memory anymore.
+    A buffer is recycled after number_of_buffers reads: the raw data returned by read_file stays valid until then.
+    """
+
+    def __init__(self, number_of_buffers: int = 2):
+        assert number_of_buffers > 0, "The pool must contain at least one buffer."
+        self._file_buffers = [np.empty(0, dtype=np.uint8) for _ in range(number_of_buffers)]
+        self._next_buffer_index = 0
+
+    def read_file(self, file_path: Union[str, Path]) -> np.ndarray:
+        file_path = Path(file_path)
+        file_size = file_path.stat().st_size
+
+        buffer_index = self._next_buffer_index
+        self._next_buffer_index = (buffer_index + 1) % len(self._file_buffers)
+        if self._file_buffers[buffer_index].size < file_size:
+            # Some margin is taken so that slightly bigger images (e.g. compressed ones) do not trigger a reallocation
+            self._file_buffers[buffer_index] = np.empty(int(file_size * 1.1), dtype=np.uint8)
+
+        raw_data = self._file_buffers[buffer_index][:file_size]
+        with open(file_path, "rb") as f:
+            f.readinto(raw_data)
+        return raw_data
+
+
+def read_image(
+    image_path: Union[str, Path], in_grayscale: bool = False, buffer_pool: ImageBufferPool = None
+) -> np.ndarray:
+    flags = cv.IMREAD_GRAYSCALE if in_grayscale else cv.IMREAD_COLOR
+    if buffer_pool is None:
+        return cv.imread(str(image_path), flags)
+    return cv.imdecode(buffer_pool.read_file(image_path), flags)
+
+
+def get_reusable_buffer(buffer: np.ndarray, shape, dtype) -> np.ndarray:
+    """
+    Returns the given buffer if it matches the shape and dtype asked, otherwise a newly allocated one.
+    It is meant to be used with the dst argument of the opencv functions, to avoid allocating an image at every frame.
+    """
+    if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+        return np.empty(shape, dtype=dtype)
+    return buffer